@@ -0,0 +1,24 @@
+import os
+import sqlite3
+
+# =================================================================
+# ALMACENAMIENTO LOCAL (spool, cachés persistentes, artefactos)
+# =================================================================
+
+DIRECTORIO_DATOS = os.environ.get(
+    "DASHBI_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+def ruta(*partes: str) -> str:
+    """Ruta dentro del directorio de datos local, creando las carpetas necesarias."""
+    destino = os.path.join(DIRECTORIO_DATOS, *partes)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    return destino
+
+def conectar_sqlite(nombre: str, durable: bool = False) -> sqlite3.Connection:
+    """Abre una conexión SQLite en modo WAL; `durable` fuerza fsync en cada commit."""
+    conn = sqlite3.connect(ruta(nombre), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+    return conn
@@ -1,18 +1,15 @@
 import streamlit as st
-from supabase import create_client, Client
 import datetime
 import pytz
 import time
+from supabase_client import get_supabase_auth
 
-# --- IMPORTACIONES DE MÓDULOS LOCALES ---
-# Asegúrate de que estos archivos existan en tu directorio
-try:
-    from dashboard_rotacion import render_rotacion_dashboard
-    from encuestas_historial import historial_encuestas_module
-    from usabilidad_module import render_modulo_usabilidad 
-    from encuesta_interna import render_formulario_encuesta
-except ImportError as e:
-    st.error(f"Error al importar módulos: {e}")
+# --- MÓDULOS DE PÁGINA ---
+# Se importan bajo demanda desde el registro (paginas.py) al navegar a cada una
+from paginas import paginas_para_rol, render_pagina, reporte_importacion
+from instrumentacion import medir, render_panel_instrumentacion
+from sesion_auth import (guardar_sesion, recuperar_sesion, sesion_vencida, cerrar_sesion_local,
+                         correo_valido, correo_registrado)
 
 # ============================================================
 # 0. CONFIGURACIÓN INICIAL
@@ -20,13 +17,21 @@ except ImportError as e:
 TIMEZONE_PERU = pytz.timezone("America/Lima")
 st.set_page_config(page_title="App Deserción Laboral", layout="wide")
 
-@st.cache_resource
-def get_supabase() -> Client:
-    url = st.secrets.get("SUPABASE_URL")
-    key = st.secrets.get("SUPABASE_KEY")
-    return create_client(url, key)
+supabase = get_supabase_auth()
+
+# Hilo que vacía el spool de encuestas SUS pendientes (una vez por proceso)
+try:
+    from cola_encuestas import iniciar_worker
+    iniciar_worker()
+except Exception as e:
+    st.warning(f"No se pudo iniciar el envío diferido de encuestas: {e}")
 
-supabase = get_supabase()
+# Precarga de consolidado y encuestas en segundo plano (una vez por proceso)
+try:
+    from cache_swr import iniciar_precalentado
+    iniciar_precalentado()
+except Exception as e:
+    st.warning(f"No se pudo iniciar la precarga de datos: {e}")
 
 # ============================================================
 # 1. GESTIÓN DE SESIÓN (ESTRICTA)
@@ -64,6 +69,7 @@ def login_callback():
         if res and res.user:
             # Limpiamos errores y configuramos sesión
             if "login_error" in st.session_state: del st.session_state.login_error
+            if res.session: guardar_sesion(res.session)
             _setup_session(res.user)
         else:
             st.session_state.login_error = "Credenciales incorrectas."
@@ -71,6 +77,7 @@ def login_callback():
         st.session_state.login_error = "Error de conexión o credenciales inválidas."
 
 def handle_logout():
+    cerrar_sesion_local()
     supabase.auth.sign_out()
     # Limpieza total para evitar que la sesión quede "colgada"
     for key in list(st.session_state.keys()):
@@ -136,23 +143,20 @@ def render_auth_page():
             # --- VALIDACIÓN DE CORREO EXISTENTE ---
             email_existe = False
             if reg_email:
-                # Consultamos en la tabla 'profiles' o donde guardes los datos del usuario
-                # Nota: Debes tener una tabla vinculada a Auth para que esto funcione
-                try:
-                    check_user = supabase.table("profiles").select("email").eq("email", reg_email).execute()
-                    if len(check_user.data) > 0:
-                        email_existe = True
-                        st.error(f"⚠️ El correo {reg_email} ya se encuentra registrado.")
-                except Exception:
-                    # Si la tabla profiles no existe aún o no tienes permisos de lectura
-                    pass
+                # Consultamos la tabla 'profiles' solo con correos completos; el
+                # resultado se memoiza unos segundos para no repetir la consulta en cada rerun
+                if not correo_valido(reg_email):
+                    st.caption("Ingresa un correo válido.")
+                elif correo_registrado(reg_email):
+                    email_existe = True
+                    st.error(f"⚠️ El correo {reg_email} ya se encuentra registrado.")
 
             reg_name = st.text_input("Nombre completo")
             reg_role = st.selectbox("Cargo / Puesto", ["analista", "auditor", "admin"])
             reg_pass = st.text_input("Contraseña", type="password", key="reg_pass_key")
             
             # El botón se bloquea si el correo existe
-            btn_bloqueado = email_existe or not reg_email or not reg_name or len(reg_pass) < 8
+            btn_bloqueado = email_existe or not correo_valido(reg_email) or not reg_name or len(reg_pass) < 8
             
             if st.button("Registrarse", use_container_width=True, disabled=btn_bloqueado):
                 try:
@@ -192,19 +196,20 @@ def render_sidebar():
         st.caption(f"🕒 {st.session_state.get('session_time_pe')}")
         st.markdown("---")
         
-        # Definición de menú según rol
-        if role == "admin":
-            menu = ["Dashboard", "Historial de Encuesta", "Calificar Dashboard", "Módulo de Usabilidad"]
-        elif role == "analista":
-            menu = ["Dashboard", "Historial de Encuesta", "Calificar Dashboard"]
-        else: # auditor
-            menu = ["Historial de Encuesta", "Calificar Dashboard"]
+        # Definición de menú según rol (ver PAGINAS en paginas.py)
+        menu = paginas_para_rol(role)
         
         for p in menu:
             if st.button(p, use_container_width=True, type="primary" if current_page == p else "secondary"):
                 st.session_state.current_page = p
                 st.rerun()
         
+        if role == "admin":
+            with st.expander("⏱️ Perfil de importación"):
+                if st.button("Medir páginas", use_container_width=True):
+                    with st.spinner("Importando cada página en un intérprete limpio..."):
+                        st.dataframe(reporte_importacion(), hide_index=True, use_container_width=True)
+
         st.markdown("---")
         if st.button("Cerrar Sesión", use_container_width=True):
             handle_logout()
@@ -214,20 +219,26 @@ def render_sidebar():
 # ============================================================
 
 # Paso 1: Verificar si ya hay una sesión autenticada en el estado de Streamlit
+if st.session_state.get("authenticated") is True and sesion_vencida():
+    # El token expiró y no se pudo renovar con el refresh token
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.session_state.login_error = "Tu sesión expiró. Ingresa nuevamente."
+    st.rerun()
+
 if st.session_state.get("authenticated") is True:
     render_sidebar()
     current = st.session_state.get("current_page")
     role = st.session_state.get("user_role")
 
-    # Ejecución de módulos con protección de ruta
-    if current == "Dashboard" and role in ["admin", "analista"]:
-        render_rotacion_dashboard()
-    elif current == "Historial de Encuesta":
-        historial_encuestas_module()
-    elif current == "Calificar Dashboard":
-        render_formulario_encuesta()
-    elif current == "Módulo de Usabilidad" and role == "admin":
-        render_modulo_usabilidad()
+    # Ejecución de módulos con protección de ruta (el módulo se importa al primer uso)
+    if current in paginas_para_rol(role):
+        with medir(f"página: {current}"):
+            render_pagina(current)
+        if role == "admin":
+            render_panel_instrumentacion()
+            from cola_encuestas import render_panel_cola
+            render_panel_cola()
     else:
         # Si por alguna razón el usuario está en una página no permitida, lo mandamos a la base
         st.warning("No tienes permisos para esta sección.")
@@ -237,11 +248,12 @@ if st.session_state.get("authenticated") is True:
 # Paso 2: Si no está autenticado, intentar recuperar de Supabase o mostrar Login
 else:
     try:
-        # Solo intentamos recuperar sesión si no hay un error de login actual
+        # Solo intentamos recuperar sesión si no hay un error de login actual;
+        # la caché evita consultar a Supabase Auth en cada rerun
         if "login_error" not in st.session_state:
-            session_resp = supabase.auth.get_session()
-            if session_resp and session_resp.session:
-                _setup_session(session_resp.session.user)
+            usuario = recuperar_sesion()
+            if usuario is not None:
+                _setup_session(usuario)
                 st.rerun()
             else:
                 render_auth_page()
@@ -0,0 +1,47 @@
+"""Micro-benchmark: cubo de rotación con pandas frente a DuckDB embebido.
+
+Uso: python bench_motores.py [n_filas ...]
+"""
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from dashboard_rotacion import construir_cubo, filtrar_cubo, kpis_desde_cubo, _cubo_desde_filas
+from datos import normalizar_consolidado, COLUMNAS_CONSOLIDADO
+import motor_consultas
+
+def _consolidado_sintetico(n, rng):
+    df = pd.DataFrame({
+        "EmployeeNumber": np.arange(n),
+        "Age": rng.integers(18, 65, n),
+        "MonthlyIncome": rng.integers(1_000, 20_000, n).astype(float),
+        "Gender": rng.choice(["Male", "Female"], n),
+        "OverTime": rng.choice(["Yes", "No"], n),
+        "Department": rng.choice(["Sales", "Research & Development", "Human Resources"], n),
+        "JobRole": rng.choice(["Analyst", "Manager", "Technician"], n),
+        "JobSatisfaction": rng.integers(1, 5, n),
+        "WorkLifeBalance": rng.integers(1, 5, n),
+        "YearsAtCompany": rng.integers(0, 40, n),
+        "FechaSalida": np.where(rng.random(n) < 0.16, "2024-06-30", None),
+        "Tipocontrato": rng.choice(["Indefinido", "Plazo fijo"], n),
+    })
+    return normalizar_consolidado(df[COLUMNAS_CONSOLIDADO])
+
+def _mejor_tiempo(fn, repeticiones=3):
+    return min(timeit.repeat(fn, number=1, repeat=repeticiones))
+
+def main(tamanos):
+    rng = np.random.default_rng(42)
+    print(f"{'filas':>10} {'pandas':>10} {'duckdb':>10} {'mejora':>8}")
+    for n in tamanos:
+        df = _consolidado_sintetico(n, rng)
+        pandas_cubo = lambda: filtrar_cubo(construir_cubo(df), 'Femenino', 'Todos')
+        duckdb_cubo = lambda: _cubo_desde_filas(motor_consultas.cubo_rotacion(df, 'Femenino', 'Todos'))
+        assert kpis_desde_cubo(pandas_cubo())["bajas"] == kpis_desde_cubo(duckdb_cubo())["bajas"]
+
+        t_pandas = _mejor_tiempo(pandas_cubo)
+        t_duckdb = _mejor_tiempo(duckdb_cubo)
+        print(f"{n:>10,} {t_pandas*1e3:>8.1f}ms {t_duckdb*1e3:>8.1f}ms {t_pandas/t_duckdb:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10_000, 1_000_000, 5_000_000])
@@ -0,0 +1,40 @@
+"""Micro-benchmark: kernel SUS vectorizado frente a la versión anterior por columnas.
+
+Uso: python bench_sus.py [n_filas ...]
+"""
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from usabilidad_module import calcular_sus, calcular_sus_array, calcular_sus_por_bloques, ITEMS_SUS
+
+def calcular_sus_anterior(df):
+    df_sus = df.copy()
+    for i in range(1, 11):
+        col = f'p{i}'
+        if i % 2 != 0:
+            df_sus[col] = df_sus[col] - 1
+        else:
+            df_sus[col] = 5 - df_sus[col]
+    return df_sus[[f'p{i}' for i in range(1, 11)]].sum(axis=1) * 2.5
+
+def _mejor_tiempo(fn, repeticiones=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeticiones))
+
+def main(tamanos):
+    rng = np.random.default_rng(42)
+    print(f"{'filas':>10} {'anterior':>12} {'calcular_sus':>14} {'kernel':>10} {'bloques':>10} {'mejora':>8}")
+    for n in tamanos:
+        matriz = rng.integers(1, 6, size=(n, 10), dtype=np.int8)
+        df = pd.DataFrame(matriz.astype(np.int64), columns=ITEMS_SUS)
+        assert np.allclose(calcular_sus_anterior(df).to_numpy(), calcular_sus_array(matriz)[0])
+
+        t_anterior = _mejor_tiempo(lambda: calcular_sus_anterior(df))
+        t_df = _mejor_tiempo(lambda: calcular_sus(df))
+        t_kernel = _mejor_tiempo(lambda: calcular_sus_array(matriz))
+        t_bloques = _mejor_tiempo(lambda: calcular_sus_por_bloques(matriz))
+        print(f"{n:>10,} {t_anterior*1e3:>10.2f}ms {t_df*1e3:>12.2f}ms {t_kernel*1e3:>8.2f}ms "
+              f"{t_bloques*1e3:>8.2f}ms {t_anterior/t_kernel:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
@@ -0,0 +1,126 @@
+"""Micro-benchmark: lectura masiva en JSON (dicts por fila) frente a CSV comprimido.
+
+Simula la respuesta de PostgREST en memoria (ambas con gzip, como llegan por
+HTTP) y mide tamaño transferido, tiempo de parseo y pico de memoria. Antes
+verifica la paginación completa de _descargar_consolidado() (CSV y JSON)
+contra un PostgREST simulado con varias páginas.
+
+Uso: python bench_transporte.py [n_filas ...]
+"""
+import gzip
+import io
+import json
+import sys
+import timeit
+import tracemalloc
+import zlib
+from unittest import mock
+import httpx
+import numpy as np
+import pandas as pd
+from supabase import create_client, ClientOptions
+import supabase_client
+from supabase_client import _CuerpoHTTP, TAMANO_BUFFER_CSV, TAMANO_PAGINA
+import datos
+from datos import COLUMNAS_CONSOLIDADO, COLUMNAS_NUMERICAS, DTYPES_LECTURA, CLAVE_PAGINACION
+
+TROZO_RED = 16 * 1024
+
+def _filas_sinteticas(n, rng):
+    return pd.DataFrame({
+        "EmployeeNumber": np.arange(n),
+        "Age": rng.integers(18, 65, n),
+        "MonthlyIncome": rng.integers(1_000, 20_000, n).astype(float),
+        "Gender": rng.choice(["Male", "Female"], n),
+        "OverTime": rng.choice(["Yes", "No"], n),
+        "Department": rng.choice(["Sales", "Research & Development", "Human Resources"], n),
+        "JobRole": rng.choice(["Sales Executive", "Research Scientist", "Laboratory Technician"], n),
+        "JobSatisfaction": rng.integers(1, 5, n),
+        "WorkLifeBalance": rng.integers(1, 5, n),
+        "YearsAtCompany": rng.integers(0, 40, n),
+        "FechaSalida": np.where(rng.random(n) < 0.16, "2024-06-30", None),
+        "Tipocontrato": rng.choice(["Indefinido", "Plazo fijo"], n),
+    })[COLUMNAS_CONSOLIDADO]
+
+def _trozos_descomprimidos(cuerpo_gzip):
+    """Descomprime por trozos como lo hace httpx al iterar la respuesta."""
+    descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for i in range(0, len(cuerpo_gzip), TROZO_RED):
+        trozo = descompresor.decompress(cuerpo_gzip[i:i + TROZO_RED])
+        if trozo:
+            yield trozo
+
+def leer_json(cuerpo_gzip):
+    filas = json.loads(b"".join(_trozos_descomprimidos(cuerpo_gzip)))
+    df = pd.DataFrame.from_records(filas, columns=COLUMNAS_CONSOLIDADO)
+    for col in COLUMNAS_NUMERICAS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+def leer_csv(cuerpo_gzip):
+    cuerpo = io.BufferedReader(_CuerpoHTTP(_trozos_descomprimidos(cuerpo_gzip)), TAMANO_BUFFER_CSV)
+    return pd.read_csv(cuerpo, dtype=DTYPES_LECTURA, engine="c")
+
+# --- PAGINACIÓN DE PUNTA A PUNTA ---
+def _postgrest_simulado(df):
+    """Keyset sobre la clave como PostgREST; 400 si el cursor no es un entero válido."""
+    def responder(request):
+        params = request.url.params
+        filas = df
+        filtro = params.get(CLAVE_PAGINACION)
+        if filtro:
+            cursor = filtro.removeprefix("gt.")
+            if not cursor.lstrip("-").isdigit():
+                return httpx.Response(400, json={
+                    "code": "22P02", "message": f'invalid input syntax for type integer: "{cursor}"'
+                })
+            filas = filas[filas[CLAVE_PAGINACION] > int(cursor)]
+        filas = filas.sort_values(CLAVE_PAGINACION).head(int(params.get("limit", len(df))))
+        # Un solo Accept: con "application/json, text/csv" PostgREST responde con el primero
+        if request.headers.get("accept") == "text/csv":
+            return httpx.Response(200, content=gzip.compress(filas.to_csv(index=False).encode()),
+                                  headers={"Content-Type": "text/csv", "Content-Encoding": "gzip"})
+        return httpx.Response(200, json=json.loads(filas.to_json(orient="records")))
+    return responder
+
+def verificar_paginacion(n=int(TAMANO_PAGINA * 2.5)):
+    df = _filas_sinteticas(n, np.random.default_rng(7))
+    cliente = httpx.Client(transport=httpx.MockTransport(_postgrest_simulado(df)))
+    supabase = create_client("http://postgrest.local", "bench.clave.local", ClientOptions(httpx_client=cliente))
+    for formato in ["csv", "json"]:
+        with mock.patch.object(supabase_client, "get_supabase", lambda: supabase), \
+                mock.patch.object(supabase_client, "get_http_client", lambda: cliente), \
+                mock.patch.object(supabase_client, "lectura_csv", lambda: formato == "csv"):
+            leido = datos._descargar_consolidado()
+        assert leido[CLAVE_PAGINACION].tolist() == df[CLAVE_PAGINACION].tolist(), formato
+        print(f"paginación {formato}: {len(leido):,} filas en {-(-n // TAMANO_PAGINA)} páginas OK")
+
+def _pico_memoria(fn):
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+def _mejor_tiempo(fn, repeticiones=3):
+    return min(timeit.repeat(fn, number=1, repeat=repeticiones))
+
+def main(tamanos):
+    verificar_paginacion()
+    rng = np.random.default_rng(42)
+    print(f"{'filas':>10} {'formato':>8} {'crudo MB':>9} {'gzip MB':>8} {'parseo':>10} {'pico MB':>8}")
+    for n in tamanos:
+        df = _filas_sinteticas(n, rng)
+        json_crudo = json.dumps(df.astype(object).where(df.notna(), None).to_dict("records")).encode()
+        csv_crudo = df.to_csv(index=False).encode()
+        for formato, crudo, lector in [("json", json_crudo, leer_json), ("csv", csv_crudo, leer_csv)]:
+            comprimido = gzip.compress(crudo, compresslevel=6)
+            resultado = lector(comprimido)
+            assert len(resultado) == n and resultado["FechaSalida"].notna().sum() == df["FechaSalida"].notna().sum()
+            t = _mejor_tiempo(lambda: lector(comprimido))
+            pico = _pico_memoria(lambda: lector(comprimido))
+            print(f"{n:>10,} {formato:>8} {len(crudo)/1e6:>9.2f} {len(comprimido)/1e6:>8.2f} "
+                  f"{t*1e3:>8.1f}ms {pico/1e6:>8.1f}")
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
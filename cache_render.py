@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from almacen_local import ruta
+
+# =================================================================
+# CACHÉ DE IMÁGENES RENDERIZADAS (PNG/PDF) POR HUELLA DE CONTENIDO
+# Memoria con desalojo LRU y, opcionalmente (DASHBI_CACHE_RENDER_DISCO=1),
+# copia en disco compartida entre procesos y reinicios, con tope de tamaño.
+# =================================================================
+
+MAX_BYTES_MEMORIA = 64 * 1024 * 1024
+MAX_BYTES_DISCO = int(os.environ.get("DASHBI_CACHE_RENDER_MAX_MB", "256")) * 1024 * 1024
+USAR_DISCO = os.environ.get("DASHBI_CACHE_RENDER_DISCO", "0") == "1"
+CARPETA = "render"
+
+_lock = threading.Lock()
+_entradas = OrderedDict()
+_bytes_memoria = 0
+_contadores = {"aciertos_memoria": 0, "aciertos_disco": 0, "fallos": 0, "desalojos": 0}
+
+def huella(*partes) -> str:
+    """Hash estable del contenido de las entradas (DataFrames, arrays, texto, dicts)."""
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        elif isinstance(parte, np.ndarray):
+            h.update(str(parte.dtype).encode() + np.ascontiguousarray(parte).tobytes())
+        elif isinstance(parte, bytes):
+            h.update(parte)
+        else:
+            h.update(json.dumps(parte, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"|")
+    return h.hexdigest()
+
+def _ruta_disco(tipo: str, clave: str) -> str:
+    return ruta(CARPETA, tipo, f"{clave}.bin")
+
+def _podar_disco():
+    """Borra los archivos usados hace más tiempo hasta quedar bajo MAX_BYTES_DISCO."""
+    archivos = []
+    for carpeta, _, nombres in os.walk(ruta(CARPETA)):
+        for nombre in nombres:
+            if not nombre.endswith(".bin"):
+                continue
+            camino = os.path.join(carpeta, nombre)
+            try:
+                info = os.stat(camino)
+            except OSError:
+                continue  # Otro proceso lo borró mientras tanto
+            archivos.append((info.st_mtime, info.st_size, camino))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, camino in sorted(archivos):
+        if total <= MAX_BYTES_DISCO:
+            break
+        try:
+            os.remove(camino)
+        except OSError:
+            pass
+        total -= tamano
+
+def _guardar_memoria(llave: str, datos: bytes):
+    global _bytes_memoria
+    if llave in _entradas:
+        _bytes_memoria -= len(_entradas.pop(llave))
+    _entradas[llave] = datos
+    _bytes_memoria += len(datos)
+    while _bytes_memoria > MAX_BYTES_MEMORIA and len(_entradas) > 1:
+        _, viejo = _entradas.popitem(last=False)
+        _bytes_memoria -= len(viejo)
+        _contadores["desalojos"] += 1
+
+def obtener_o_generar(tipo: str, clave: str, generar, disco: bool = True) -> bytes:
+    """Devuelve los bytes cacheados para (tipo, clave) o los genera con `generar()`.
+
+    Con `disco=False` la entrada queda solo en memoria aunque el disco esté habilitado.
+    """
+    llave = f"{tipo}:{clave}"
+    disco = disco and USAR_DISCO
+    with _lock:
+        if llave in _entradas:
+            _entradas.move_to_end(llave)
+            _contadores["aciertos_memoria"] += 1
+            return _entradas[llave]
+
+    if disco:
+        destino = _ruta_disco(tipo, clave)
+        try:
+            with open(destino, "rb") as f:
+                datos = f.read()
+        except OSError:
+            datos = None
+        if datos is not None:
+            try:
+                os.utime(destino)  # La fecha de modificación marca el último uso para la poda
+            except OSError:
+                pass
+            with _lock:
+                _contadores["aciertos_disco"] += 1
+                _guardar_memoria(llave, datos)
+            return datos
+
+    datos = generar()
+    with _lock:
+        _contadores["fallos"] += 1
+        _guardar_memoria(llave, datos)
+    if disco:
+        # Escritura atómica: otro proceso nunca lee un archivo a medias
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, destino)
+            _podar_disco()
+        except OSError:
+            pass  # Sin copia en disco la imagen sigue servida desde memoria
+    return datos
+
+def estadisticas() -> dict:
+    with _lock:
+        return {**_contadores, "entradas": len(_entradas), "bytes_memoria": _bytes_memoria}
@@ -0,0 +1,104 @@
+import streamlit as st
+import importlib
+import logging
+import threading
+import time
+
+# =================================================================
+# CACHÉ STALE-WHILE-REVALIDATE
+# Al vencer (cambio del token de versión o, sin token, por edad) se sigue
+# sirviendo el valor anterior y un hilo en segundo plano lo recarga. Solo una carga por nombre a la vez: las sesiones
+# concurrentes nunca duplican la descarga.
+# =================================================================
+
+logger = logging.getLogger(__name__)
+
+REINTENTO_SEG = 30  # Espera tras una recarga fallida antes de volver a intentar
+
+# Datasets que se cargan al arrancar el servidor, sin bloquear el login.
+# Desde datos.py, que no importa plotly ni las páginas.
+PRECALENTAR = [
+    ("datos", "precargar_consolidado"),
+    ("datos", "get_survey_snapshot"),
+]
+
+@st.cache_resource
+def _entradas() -> dict:
+    return {"lock": threading.Lock(), "por_nombre": {}}
+
+def _entrada(nombre: str) -> dict:
+    registro = _entradas()
+    with registro["lock"]:
+        if nombre not in registro["por_nombre"]:
+            registro["por_nombre"][nombre] = {
+                # (valor, cargado_en, version) se reemplaza completo para leerlo siempre coherente
+                "dato": None, "proximo_intento": 0.0, "refrescando": False,
+                "lock_carga": threading.Lock(), "lock_estado": threading.Lock(),
+            }
+        return registro["por_nombre"][nombre]
+
+def _cargar(entrada: dict, cargar, version):
+    """Se llama con `lock_carga` tomado."""
+    try:
+        valor = cargar()
+    except Exception:
+        entrada["proximo_intento"] = time.time() + REINTENTO_SEG
+        raise
+    entrada["dato"] = (valor, time.time(), version)
+
+def _refrescar(nombre: str, entrada: dict, cargar, version):
+    try:
+        with entrada["lock_carga"]:
+            _cargar(entrada, cargar, version)
+    except Exception:
+        logger.exception("Falló la recarga en segundo plano de %s; se sigue sirviendo la anterior", nombre)
+    finally:
+        entrada["refrescando"] = False
+
+def _vencido(dato, max_edad_seg: float, version) -> bool:
+    _, cargado_en, version_cargada = dato
+    if version is not None:
+        return version != version_cargada
+    return time.time() - cargado_en >= max_edad_seg
+
+def obtener_versionado(nombre: str, cargar, max_edad_seg: float, version=None) -> tuple:
+    """(valor, versión servida) de `cargar()`; si venció, se devuelve igual y se recarga en segundo plano.
+
+    Con `version` (token de versiones.py) solo se recarga cuando el token cambia; sin token
+    se usa `max_edad_seg`. La versión servida identifica los datos devueltos, para indexar
+    cachés derivadas. Solo la primera carga bloquea, y quien llega mientras tanto la espera.
+    """
+    entrada = _entrada(nombre)
+    if entrada["dato"] is None:
+        with entrada["lock_carga"]:
+            # Quien esperaba el lock reutiliza la carga del primero
+            if entrada["dato"] is None:
+                _cargar(entrada, cargar, version)
+
+    dato = entrada["dato"]
+    if _vencido(dato, max_edad_seg, version) and time.time() >= entrada["proximo_intento"]:
+        with entrada["lock_estado"]:
+            lanzar = not entrada["refrescando"]
+            entrada["refrescando"] = True
+        if lanzar:
+            threading.Thread(target=_refrescar, args=(nombre, entrada, cargar, version),
+                             name=f"swr-{nombre}", daemon=True).start()
+    valor, cargado_en, version_cargada = dato
+    return valor, version_cargada if version_cargada is not None else f"t{cargado_en}"
+
+def obtener(nombre: str, cargar, max_edad_seg: float, version=None):
+    return obtener_versionado(nombre, cargar, max_edad_seg, version)[0]
+
+def _precalentar():
+    for modulo, funcion in PRECALENTAR:
+        try:
+            getattr(importlib.import_module(modulo), funcion)()
+        except Exception:
+            logger.exception("No se pudo precalentar %s.%s", modulo, funcion)
+
+@st.cache_resource
+def iniciar_precalentado() -> threading.Thread:
+    """Una vez por proceso: carga los datasets en un hilo para que el primer usuario no espere."""
+    hilo = threading.Thread(target=_precalentar, name="swr-precalentar", daemon=True)
+    hilo.start()
+    return hilo
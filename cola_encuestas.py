@@ -0,0 +1,236 @@
+import streamlit as st
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from postgrest.exceptions import APIError
+from almacen_local import conectar_sqlite
+from supabase_client import get_supabase, ejecutar
+
+# =================================================================
+# COLA DE ESCRITURA DIFERIDA PARA ENCUESTAS SUS
+# Las respuestas se guardan primero en un spool SQLite local y un hilo en
+# segundo plano las envía a Supabase en inserciones por lotes. Las filas
+# que Supabase rechaza de forma permanente (o que agotan los reintentos)
+# pasan a la tabla local `descartadas` para no bloquear al resto.
+# =================================================================
+
+logger = logging.getLogger(__name__)
+
+TABLA_DESTINO = "encuestas_usabilidad"
+ARCHIVO_SPOOL = "spool_encuestas.db"
+TAMANO_LOTE = 100
+INTERVALO_FLUSH_SEG = 5
+RESERVA_SEG = 60          # Tiempo que un lote queda reservado por un proceso
+BACKOFF_BASE_SEG = 5
+BACKOFF_MAX_SEG = 300
+MAX_INTENTOS = 50         # Unas 4 h de reintentos con el backoff máximo
+
+# Clases SQLSTATE pasajeras: conexión, concurrencia, recursos, intervención del operador
+SQLSTATE_TRANSITORIOS = ("08", "40", "53", "57")
+
+_ESQUEMA = """
+create table if not exists pendientes (
+    idempotency_key text primary key,
+    payload text not null,
+    creado real not null,
+    intentos integer not null default 0,
+    proximo_intento real not null default 0
+)
+"""
+
+_ESQUEMA_DESCARTADAS = """
+create table if not exists descartadas (
+    idempotency_key text primary key,
+    payload text not null,
+    creado real not null,
+    intentos integer not null,
+    error text,
+    descartado real not null
+)
+"""
+
+def _conexion():
+    conn = conectar_sqlite(ARCHIVO_SPOOL, durable=True)
+    conn.execute(_ESQUEMA)
+    conn.execute(_ESQUEMA_DESCARTADAS)
+    return conn
+
+def encolar_respuesta(fila: dict) -> str:
+    """Persiste la respuesta en el spool local y devuelve su clave de idempotencia."""
+    clave = str(uuid.uuid4())
+    payload = json.dumps({**fila, "idempotency_key": clave})
+    with closing(_conexion()) as conn:
+        conn.execute(
+            "insert into pendientes (idempotency_key, payload, creado) values (?, ?, ?)",
+            (clave, payload, time.time())
+        )
+    iniciar_worker().set()
+    return clave
+
+def pendientes() -> int:
+    with closing(_conexion()) as conn:
+        return conn.execute("select count(*) from pendientes").fetchone()[0]
+
+def descartadas() -> int:
+    with closing(_conexion()) as conn:
+        return conn.execute("select count(*) from descartadas").fetchone()[0]
+
+def ultimo_descarte():
+    """(error, momento) del último rechazo, o None si no hay descartadas."""
+    with closing(_conexion()) as conn:
+        return conn.execute("select error, descartado from descartadas order by descartado desc limit 1").fetchone()
+
+def reencolar_descartadas() -> int:
+    """Devuelve las descartadas a la cola (p. ej. tras aplicar la migración que faltaba)."""
+    with closing(_conexion()) as conn:
+        conn.execute("begin immediate")
+        conn.execute(
+            "insert or ignore into pendientes (idempotency_key, payload, creado) "
+            "select idempotency_key, payload, creado from descartadas"
+        )
+        n = conn.execute("delete from descartadas").rowcount
+        conn.execute("commit")
+    iniciar_worker().set()
+    return n
+
+def _es_permanente(error) -> bool:
+    """Rechazos que no se arreglan reintentando: datos inválidos, columna faltante, permisos."""
+    if not isinstance(error, APIError):
+        return False  # Red, timeouts y errores inesperados se reintentan
+    codigo = str(error.code or "")
+    if not codigo or codigo.startswith("PGRST0"):
+        return False  # Sin código o sin conexión a la base (503/504)
+    if len(codigo) == 3 and codigo.isdigit():
+        # Respuesta sin JSON: postgrest deja el estado HTTP como código
+        return codigo.startswith("4") and codigo not in ("408", "429")
+    return not codigo.startswith(SQLSTATE_TRANSITORIOS)
+
+def _descartar(conn, claves: list, error):
+    conn.execute("begin immediate")
+    for clave in claves:
+        conn.execute(
+            "insert or replace into descartadas (idempotency_key, payload, creado, intentos, error, descartado) "
+            "select idempotency_key, payload, creado, intentos, ?, ? from pendientes where idempotency_key = ?",
+            (str(error)[:2000], time.time(), clave)
+        )
+        conn.execute("delete from pendientes where idempotency_key = ?", (clave,))
+    conn.execute("commit")
+    logger.warning("%d respuestas pasaron a descartadas: %s", len(claves), error)
+
+def _reservar_lote(conn) -> list:
+    """Toma un lote listo para enviar y lo reserva para que otro proceso no lo duplique."""
+    ahora = time.time()
+    conn.execute("begin immediate")
+    try:
+        filas = conn.execute(
+            "select idempotency_key, payload from pendientes where proximo_intento <= ? order by creado limit ?",
+            (ahora, TAMANO_LOTE)
+        ).fetchall()
+        if filas:
+            conn.executemany(
+                "update pendientes set proximo_intento = ? where idempotency_key = ?",
+                [(ahora + RESERVA_SEG, clave) for clave, _ in filas]
+            )
+        conn.execute("commit")
+    except Exception:
+        conn.execute("rollback")
+        raise
+    return filas
+
+def _enviar_aislando(conn, lote: list) -> int:
+    """Envía el lote; ante un rechazo permanente lo parte en mitades hasta aislar las filas inválidas.
+
+    Los errores pasajeros se propagan para que el lote completo espere con backoff.
+    """
+    try:
+        # La clave de idempotencia evita duplicados si un lote se reintenta
+        ejecutar(
+            get_supabase().table(TABLA_DESTINO)
+            .upsert([json.loads(p) for _, p in lote], on_conflict="idempotency_key", ignore_duplicates=True)
+        )
+    except Exception as e:
+        if not _es_permanente(e):
+            raise
+        if len(lote) == 1:
+            _descartar(conn, [lote[0][0]], e)
+            return 0
+        mitad = len(lote) // 2
+        return _enviar_aislando(conn, lote[:mitad]) + _enviar_aislando(conn, lote[mitad:])
+    conn.executemany("delete from pendientes where idempotency_key = ?", [(clave,) for clave, _ in lote])
+    return len(lote)
+
+def _posponer(conn, claves: list, error):
+    """Backoff exponencial; las filas que agotan MAX_INTENTOS pasan a descartadas."""
+    conn.executemany(
+        "update pendientes set intentos = intentos + 1, "
+        "proximo_intento = ? + min(?, ? * (1 << min(intentos, 10))) where idempotency_key = ?",
+        [(time.time(), BACKOFF_MAX_SEG, BACKOFF_BASE_SEG, clave) for clave in claves]
+    )
+    agotadas = [
+        clave for (clave,) in conn.execute(
+            f"select idempotency_key from pendientes where intentos >= ? and idempotency_key in ({','.join('?' * len(claves))})",
+            (MAX_INTENTOS, *claves)
+        )
+    ]
+    if agotadas:
+        _descartar(conn, agotadas, error)
+
+def enviar_pendientes() -> int:
+    """Envía los lotes listos; devuelve cuántas respuestas se confirmaron en Supabase."""
+    enviadas = 0
+    with closing(_conexion()) as conn:
+        while True:
+            lote = _reservar_lote(conn)
+            if not lote:
+                break
+            try:
+                enviadas += _enviar_aislando(conn, lote)
+            except Exception as e:
+                logger.warning("No se pudo enviar un lote de %d respuestas; se reintenta con backoff: %s", len(lote), e)
+                # Las filas ya enviadas en una mitad anterior ya no están en pendientes
+                _posponer(conn, [clave for clave, _ in lote], e)
+                break
+    return enviadas
+
+def _bucle_envio(despertar: threading.Event):
+    while True:
+        despertar.wait(INTERVALO_FLUSH_SEG)
+        despertar.clear()
+        try:
+            enviar_pendientes()
+        except Exception:
+            # El spool conserva las respuestas; se reintenta en el siguiente ciclo
+            logger.exception("Falló el vaciado del spool de encuestas")
+
+@st.cache_resource
+def iniciar_worker() -> threading.Event:
+    """Arranca (una vez por proceso) el hilo que vacía el spool; devuelve su evento de aviso."""
+    despertar = threading.Event()
+    threading.Thread(target=_bucle_envio, args=(despertar,), daemon=True, name="cola-encuestas").start()
+    despertar.set()  # Envía lo que haya quedado pendiente de una ejecución anterior
+    return despertar
+
+# --- PANEL PARA ADMINISTRADORES ---
+def render_panel_cola():
+    """Respuestas aún en el spool y rechazadas por Supabase, con la opción de reencolarlas."""
+    try:
+        n_pendientes, n_descartadas = pendientes(), descartadas()
+    except (OSError, sqlite3.Error) as e:
+        st.sidebar.caption(f"⚠️ Spool de encuestas no disponible: {e}")
+        return
+    etiqueta = "📮 Envío de encuestas" + (f" (⚠️ {n_descartadas} descartadas)" if n_descartadas else "")
+    with st.sidebar.expander(etiqueta):
+        c1, c2 = st.columns(2)
+        c1.metric("Pendientes", n_pendientes)
+        c2.metric("Descartadas", n_descartadas)
+        if not n_descartadas:
+            return
+        error, momento = ultimo_descarte()
+        st.caption(f"Último rechazo ({time.strftime('%d/%m %H:%M', time.localtime(momento))}): {error}")
+        # on_click corre antes del rerun, así los contadores ya salen actualizados
+        st.button("↩️ Reencolar descartadas", on_click=reencolar_descartadas, use_container_width=True,
+                  help="Tras corregir la causa (p. ej. aplicar la migración que faltaba)")
@@ -1,36 +1,310 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from supabase import create_client, Client
-
-# --- CONFIGURACIÓN DE PÁGINA ---
-st.set_page_config(layout="wide", page_title="Portal de Analítica de Talento")
-
-@st.cache_data(ttl=600)
-def load_consolidado():
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    supabase = create_client(url, key)
-    res = supabase.table("consolidado").select("*").execute()
-    df = pd.DataFrame(res.data)
-    
-    # --- PROCESAMIENTO CORRECTO (CORREGIDO) ---
-    df['Estado'] = df['FechaSalida'].apply(lambda x: 'Renunció' if pd.notna(x) else 'Activo')
-    # Convertir a numérico sin crear booleanos
-    df['MonthlyIncome'] = pd.to_numeric(df['MonthlyIncome'], errors='coerce')
-    df['Genero'] = df['Gender'].map({'Male': 'Masculino', 'Female': 'Femenino'}).fillna(df['Gender'])
-    df['HorasExtra'] = df['OverTime'].map({'Yes': 'Sí', 'No': 'No'}).fillna(df['OverTime'])
-    
-    traduccion_dept = {
-        'Sales': 'Ventas',
-        'Research & Development': 'Investigación y Desarrollo',
-        'Human Resources': 'Recursos Humanos'
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import logging
+from supabase_client import rpc
+from instrumentacion import instrumentar, marcar_calculo, mostrar_grafico
+from datos import load_consolidado_versionado, usar_agregados_servidor, TTL_CONSOLIDADO_SEG
+from sesion_auth import token_acceso
+import motor_consultas
+import versiones
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# CUBO PRE-AGREGADO PARA LOS FILTROS DEL DASHBOARD
+# =================================================================
+LLAVES_CUBO = ['Genero', 'Tipocontrato', 'Estado']
+DIMENSIONES_CUBO = ['JobSatisfaction', 'WorkLifeBalance', 'Departamento', 'HorasExtra', 'YearsAtCompany']
+DIMENSION_TOTAL = '__total__'
+
+def construir_cubo(df):
+    """Agrega conteos e ingresos por (Genero, Tipocontrato, Estado, valor de dimensión)."""
+    # Ingreso en float64 para que las sumas del cubo no pierdan precisión
+    df = df.assign(_ingreso=df['MonthlyIncome'].astype('float64'))
+    partes = []
+    for dim in [DIMENSION_TOTAL] + DIMENSIONES_CUBO:
+        llaves = LLAVES_CUBO if dim == DIMENSION_TOTAL else LLAVES_CUBO + [dim]
+        agg = (
+            df.groupby(llaves, observed=True, dropna=False)
+            .agg(cantidad=('Estado', 'size'), ingreso_suma=('_ingreso', 'sum'), ingreso_n=('_ingreso', 'count'))
+            .reset_index()
+        )
+        agg['valor'] = agg[dim].astype(object) if dim != DIMENSION_TOTAL else None
+        agg['dimension'] = dim
+        partes.append(agg[LLAVES_CUBO + ['dimension', 'valor', 'cantidad', 'ingreso_suma', 'ingreso_n']])
+    cubo = pd.concat(partes, ignore_index=True)
+    cubo['dimension'] = cubo['dimension'].astype('category')
+    return cubo
+
+@instrumentar("load_cubo_rotacion")
+@st.cache_data(max_entries=2)
+@marcar_calculo
+def load_cubo_rotacion(_df, version):
+    """Cubo del consolidado `_df`; `version` (la servida junto a `_df`) es la clave de caché."""
+    return construir_cubo(_df)
+
+def filtrar_cubo(cubo, genero_sel, contrato_sel):
+    mask = np.ones(len(cubo), dtype=bool)
+    if genero_sel != 'Todos': mask &= (cubo['Genero'] == genero_sel).to_numpy()
+    if contrato_sel != 'Todos': mask &= (cubo['Tipocontrato'] == contrato_sel).to_numpy()
+    return cubo[mask]
+
+def kpis_desde_cubo(cubo):
+    """Plantilla, bajas, tasa de rotación e ingreso promedio a partir del nivel total."""
+    base = cubo[cubo['dimension'] == DIMENSION_TOTAL]
+    total = int(base['cantidad'].sum())
+    bajas = int(base.loc[base['Estado'] == 'Renunció', 'cantidad'].sum())
+    tasa = (bajas/total*100) if total > 0 else 0
+    n_ingreso = base['ingreso_n'].sum()
+    ingreso = base['ingreso_suma'].sum() / n_ingreso if n_ingreso > 0 else 0
+    return {"total": total, "bajas": bajas, "tasa": tasa, "ingreso": ingreso}
+
+def conteo_dimension(cubo, dim, estado=None, por_estado=False):
+    """Conteo por valor de una dimensión (opcionalmente solo un Estado o separado por Estado)."""
+    sub = cubo[cubo['dimension'] == dim]
+    if estado is not None:
+        sub = sub[sub['Estado'] == estado]
+    llaves = ['valor', 'Estado'] if por_estado else ['valor']
+    res = sub.dropna(subset=['valor']).groupby(llaves, observed=True)['cantidad'].sum().reset_index(name='Cantidad')
+    return res.rename(columns={'valor': dim})
+
+def tasa_fuga_por_area(cubo):
+    conteo = conteo_dimension(cubo, 'Departamento', por_estado=True)
+    tabla = conteo.pivot_table(index='Departamento', columns='Estado', values='Cantidad', aggfunc='sum', observed=True).fillna(0)
+    return tabla.div(tabla.sum(axis=1), axis=0)
+
+# =================================================================
+# MODO SERVIDOR: CUBO CALCULADO EN POSTGRES (sql/rotacion_agregados.sql)
+# =================================================================
+DIMENSIONES_NUMERICAS = ['JobSatisfaction', 'WorkLifeBalance', 'YearsAtCompany']
+
+def _cubo_desde_filas(filas):
+    """Lleva las filas de la RPC al mismo formato que construir_cubo()."""
+    columnas = LLAVES_CUBO + ['dimension', 'valor', 'cantidad', 'ingreso_suma', 'ingreso_n']
+    cubo = pd.DataFrame.from_records(filas, columns=columnas)
+    cubo['valor'] = cubo['valor'].astype(object)
+    numericas = cubo['dimension'].isin(DIMENSIONES_NUMERICAS)
+    cubo.loc[numericas, 'valor'] = pd.to_numeric(cubo.loc[numericas, 'valor']).astype('Int64').astype(object)
+    for col in ['cantidad', 'ingreso_n']:
+        cubo[col] = pd.to_numeric(cubo[col]).astype('int64')
+    cubo['ingreso_suma'] = pd.to_numeric(cubo['ingreso_suma']).astype('float64')
+    cubo['dimension'] = cubo['dimension'].astype('category')
+    return cubo
+
+@instrumentar("load_cubo_servidor")
+@st.cache_data(max_entries=64)
+@marcar_calculo
+def load_cubo_servidor(version, genero_sel='Todos', contrato_sel='Todos', _token=None):
+    """Cubo ya filtrado en Postgres: la respuesta pesa unos cientos de filas.
+
+    `version` viene de versiones.version_o_ventana(): vence al cambiar la tabla.
+    Las RPC solo se otorgan a `authenticated`, así que se llaman con el JWT del
+    usuario (`_token`, fuera de la clave: el resultado es igual para todos ellos).
+    """
+    return _cubo_desde_filas(rpc("rotacion_cubo", _filtros_rpc(genero_sel, contrato_sel), token=_token))
+
+def _filtros_rpc(genero_sel, contrato_sel):
+    return {
+        "p_genero": None if genero_sel == 'Todos' else genero_sel,
+        "p_contrato": None if contrato_sel == 'Todos' else contrato_sel,
+    }
+
+def _grilla_desde_filas(filas):
+    """Lleva las filas de rotacion_mapa_talento al formato de grilla_talento()."""
+    # Todas las filas traen los mismos bordes (hay al menos la fila sin conteo)
+    rango = filas[0]
+    bordes_edad = np.linspace(float(rango["edad_min"]), float(rango["edad_max"]), BINS_EDAD + 1)
+    bordes_sal = np.linspace(float(rango["salario_min"]), float(rango["salario_max"]), BINS_SALARIO + 1)
+    conteos = {estado: np.zeros((BINS_EDAD, BINS_SALARIO), dtype='int64') for estado in ESTADOS_MAPA}
+    for fila in filas:
+        if fila["estado"] in conteos:
+            conteos[fila["estado"]][fila["bin_edad"], fila["bin_salario"]] = fila["cantidad"]
+    return {"bordes": (bordes_edad, bordes_sal), "conteos": conteos}
+
+@instrumentar("load_mapa_servidor", filas=None)
+@st.cache_data(max_entries=64)
+@marcar_calculo
+def load_mapa_servidor(version, genero_sel='Todos', contrato_sel='Todos', _token=None):
+    """Grilla del mapa de talento agregada en Postgres: como mucho unas mil filas."""
+    params = {**_filtros_rpc(genero_sel, contrato_sel), "p_bins_edad": BINS_EDAD, "p_bins_salario": BINS_SALARIO}
+    return _grilla_desde_filas(rpc("rotacion_mapa_talento", params, token=_token))
+
+@instrumentar("load_celda_servidor")
+@st.cache_data(max_entries=64)
+@marcar_calculo
+def load_celda_servidor(version, genero_sel, contrato_sel, r_edad, r_sal, _token=None):
+    """Colaboradores de una celda del mapa, pedidos solo al abrir el detalle."""
+    params = {
+        **_filtros_rpc(genero_sel, contrato_sel),
+        "p_edad_min": float(r_edad[0]), "p_edad_max": float(r_edad[1]),
+        "p_salario_min": float(r_sal[0]), "p_salario_max": float(r_sal[1]),
+        "p_limite": LIMITE_CELDA,
     }
-    df['Departamento'] = df['Department'].replace(traduccion_dept)
-    return df
+    celda = pd.DataFrame.from_records(rpc("rotacion_celda", params, token=_token), columns=['Age', 'MonthlyIncome', 'Estado', 'JobRole'])
+    for col in ['Age', 'MonthlyIncome']:
+        celda[col] = pd.to_numeric(celda[col], errors='coerce')
+    return celda
+
+@instrumentar("load_cubo_duckdb")
+@st.cache_data(max_entries=64)
+@marcar_calculo
+def load_cubo_duckdb(_df, version, genero_sel='Todos', contrato_sel='Todos'):
+    """Cubo filtrado calculado con DuckDB sobre el snapshot (MOTOR_CONSULTAS = "duckdb").
+
+    `version` (la servida junto a `_df`) y los filtros son la clave de caché.
+    """
+    return _cubo_desde_filas(motor_consultas.cubo_rotacion(_df, genero_sel, contrato_sel))
+
+# =================================================================
+# MAPA DE TALENTO CON NIVEL DE DETALLE (LOD)
+# =================================================================
+UMBRAL_WEBGL = 5_000        # Por encima se dibuja con WebGL (scattergl)
+UMBRAL_DENSIDAD = 50_000    # Por encima se envía una grilla 2D ya agregada
+BINS_EDAD = 20
+BINS_SALARIO = 25
+LIMITE_CELDA = 1_000        # Filas máximas del detalle de celda en modo servidor
+ESTADOS_MAPA = ['Activo', 'Renunció']
+COLORES_ESTADO = {'Renunció': '#EF5350', 'Activo': '#26A69A'}
+ESCALAS_ESTADO = {'Activo': 'Teal', 'Renunció': 'Reds'}
+
+def _log_payload(fig, modo, filas):
+    if logger.isEnabledFor(logging.INFO):
+        kb = len(fig.to_json()) / 1024
+        logger.info("Mapa de Talento: modo=%s filas=%d payload=%.1f KB", modo, filas, kb)
+
+def _scatter_talento(df, webgl=False):
+    fig = px.scatter(
+        df, x='Age', y='MonthlyIncome', color='Estado',
+        hover_data={'Age': True, 'MonthlyIncome': ':$,.0f', 'JobRole': True},
+        color_discrete_map=COLORES_ESTADO,
+        labels={'Age': 'Edad', 'MonthlyIncome': 'Sueldo Mensual', 'Estado': 'Estado'},
+        render_mode='webgl' if webgl else 'auto',
+        height=500, template="plotly_white"
+    )
+    if webgl:
+        fig.update_traces(marker=dict(size=6, opacity=0.6))
+    else:
+        fig.update_traces(marker=dict(size=10, opacity=0.7, line=dict(width=1, color='White')))
+    return fig
+
+def _bordes_celdas(df):
+    bordes_edad = np.histogram_bin_edges(df['Age'].dropna().to_numpy(dtype='float64'), bins=BINS_EDAD)
+    bordes_sal = np.histogram_bin_edges(df['MonthlyIncome'].dropna().to_numpy(dtype='float64'), bins=BINS_SALARIO)
+    return bordes_edad, bordes_sal
+
+def grilla_talento(df):
+    """{bordes: (edad, salario), conteos: {Estado: matriz edad x salario}} calculada con numpy."""
+    bordes_edad, bordes_sal = _bordes_celdas(df)
+    conteos = {}
+    for estado in ESTADOS_MAPA:
+        sub = df[df['Estado'] == estado]
+        conteo, _, _ = np.histogram2d(
+            sub['Age'].to_numpy(dtype='float64', na_value=np.nan),
+            sub['MonthlyIncome'].to_numpy(dtype='float64', na_value=np.nan),
+            bins=[bordes_edad, bordes_sal]
+        )
+        conteos[estado] = conteo.astype('int64')
+    return {"bordes": (bordes_edad, bordes_sal), "conteos": conteos}
+
+def _figura_densidad(grilla):
+    """Grilla Edad x Salario ya agregada, un panel por Estado."""
+    bordes_edad, bordes_sal = grilla["bordes"]
+    centros_edad = (bordes_edad[:-1] + bordes_edad[1:]) / 2
+    centros_sal = (bordes_sal[:-1] + bordes_sal[1:]) / 2
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, subplot_titles=ESTADOS_MAPA, horizontal_spacing=0.05)
+    for i, estado in enumerate(ESTADOS_MAPA, start=1):
+        fig.add_trace(go.Heatmap(
+            x=centros_edad, y=centros_sal, z=grilla["conteos"][estado].T.astype('int32'),
+            colorscale=ESCALAS_ESTADO[estado], showscale=False,
+            hovertemplate="Edad %{x:.0f}<br>Sueldo $%{y:,.0f}<br>Colaboradores: %{z}<extra></extra>"
+        ), row=1, col=i)
+    fig.update_xaxes(title_text='Edad')
+    fig.update_yaxes(title_text='Sueldo Mensual', col=1)
+    fig.update_layout(height=500, template="plotly_white")
+    return fig
+
+def construir_mapa_talento(df):
+    """Elige SVG, WebGL o grilla de densidad según la cantidad de puntos."""
+    n = len(df)
+    if n > UMBRAL_DENSIDAD:
+        fig, modo = _figura_densidad(grilla_talento(df)), "densidad"
+    elif n > UMBRAL_WEBGL:
+        fig, modo = _scatter_talento(df, webgl=True), "webgl"
+    else:
+        fig, modo = _scatter_talento(df), "svg"
+    _log_payload(fig, modo, n)
+    return fig, modo
+
+@instrumentar("mapa_talento", filas=None)
+@st.cache_resource(max_entries=16)
+@marcar_calculo
+def mapa_talento(_df, version, genero_sel, contrato_sel):
+    """Figura del mapa compartida entre sesiones mientras no cambie la versión del consolidado."""
+    return construir_mapa_talento(_df)
+
+def filas_celda(df, r_edad, r_sal):
+    edad = df['Age'].to_numpy(dtype='float64', na_value=np.nan)
+    sal = df['MonthlyIncome'].to_numpy(dtype='float64', na_value=np.nan)
+    mask = (edad >= r_edad[0]) & (edad <= r_edad[1]) & (sal >= r_sal[0]) & (sal <= r_sal[1])
+    return df[mask]
+
+def render_detalle_celda(bordes, obtener_celda, limite=None):
+    """Permite bajar a los colaboradores de un rango Edad x Salario concreto.
+
+    `obtener_celda(r_edad, r_sal)` devuelve las filas del rango (locales o desde el servidor,
+    en ese caso truncadas a `limite`).
+    """
+    bordes_edad, bordes_sal = bordes
+    rangos_edad = list(zip(bordes_edad[:-1], bordes_edad[1:]))
+    rangos_sal = list(zip(bordes_sal[:-1], bordes_sal[1:]))
+    c1, c2 = st.columns(2)
+    with c1:
+        r_edad = st.selectbox("Rango de edad", rangos_edad, format_func=lambda r: f"{r[0]:.0f} - {r[1]:.0f} años")
+    with c2:
+        r_sal = st.selectbox("Rango salarial", rangos_sal, format_func=lambda r: f"${r[0]:,.0f} - ${r[1]:,.0f}")
+    celda = obtener_celda(r_edad, r_sal)
+    if limite is not None and len(celda) >= limite:
+        st.caption(f"Se muestran los primeros {limite} colaboradores de la celda seleccionada")
+    else:
+        st.caption(f"{len(celda)} colaboradores en la celda seleccionada")
+    if len(celda) > 0:
+        fig, _ = construir_mapa_talento(celda)
+        mostrar_grafico("Detalle de celda", fig, use_container_width=True)
+
+def opciones_filtro(origen, columna):
+    """Valores para un selectbox; en columnas categóricas salen de las categorías, sin recorrer filas."""
+    serie = origen[columna]
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = serie.cat.categories.tolist()
+    else:
+        valores = serie.dropna().unique().tolist()
+    return ['Todos'] + sorted(valores)
 
 def render_rotacion_dashboard():
-    df_raw = load_consolidado()
+    # Agregados en el servidor (opcional) con el cálculo en pandas como respaldo.
+    # En modo servidor las filas del consolidado solo se descargan si falla la RPC.
+    servidor = usar_agregados_servidor()
+    duckdb_local = motor_consultas.motor_activo() == "duckdb"
+    df_raw = version = None
+    version_servidor = versiones.version_o_ventana("consolidado", TTL_CONSOLIDADO_SEG) if servidor else None
+    token = token_acceso() if servidor else None
+    cubo = None
+    if servidor:
+        try:
+            cubo = load_cubo_servidor(version_servidor, _token=token)
+        except Exception:
+            servidor = False
+            st.caption("⚠️ Agregados del servidor no disponibles; se calcula localmente.")
+    if cubo is None:
+        df_raw, version = load_consolidado_versionado()
+        # Con DuckDB solo se calcula el cubo de los filtros elegidos
+        if not duckdb_local:
+            cubo = load_cubo_rotacion(df_raw, version)
+    origen_filtros = cubo if cubo is not None else df_raw
 
     # Título Principal Centrado
     st.markdown("<h1 style='text-align: center; color: #1E3A8A;'>Reporte Estratégico de Capital Humano</h1>", unsafe_allow_html=True)
@@ -40,21 +314,32 @@ def render_rotacion_dashboard():
     st.markdown("<br>", unsafe_allow_html=True)
     f1, f2 = st.columns(2)
     with f1:
-        genero_sel = st.selectbox("🎯 Filtrar por Género:", ['Todos'] + sorted(df_raw['Genero'].unique().tolist()))
+        genero_sel = st.selectbox("🎯 Filtrar por Género:", opciones_filtro(origen_filtros, 'Genero'))
     with f2:
-        contrato_sel = st.selectbox("📄 Filtrar por Tipo de Contrato:", ['Todos'] + sorted(df_raw['Tipocontrato'].dropna().unique().tolist()))
+        contrato_sel = st.selectbox("📄 Filtrar por Tipo de Contrato:", opciones_filtro(origen_filtros, 'Tipocontrato'))
 
-    df = df_raw.copy()
-    if genero_sel != 'Todos': df = df[df['Genero'] == genero_sel]
-    if contrato_sel != 'Todos': df = df[df['Tipocontrato'] == contrato_sel]
+    # Los KPIs y barras salen del cubo; solo el mapa de dispersión necesita filas
+    cubo_f = None
+    if servidor:
+        try:
+            cubo_f = load_cubo_servidor(version_servidor, genero_sel, contrato_sel, _token=token)
+        except Exception:
+            cubo_f = None
+    elif duckdb_local:
+        try:
+            cubo_f = load_cubo_duckdb(df_raw, version, genero_sel, contrato_sel)
+        except Exception:
+            logger.exception("Motor DuckDB no disponible; se usa pandas")
+    if cubo_f is None:
+        if cubo is None:
+            cubo = load_cubo_rotacion(df_raw, version)
+        cubo_f = filtrar_cubo(cubo, genero_sel, contrato_sel)
 
     st.markdown("---")
 
     # --- KPIs AJUSTADOS ---
-    total = len(df)
-    bajas = len(df[df['Estado'] == 'Renunció'])
-    tasa = (bajas/total*100) if total > 0 else 0
-    ingreso = df['MonthlyIncome'].mean() if not df.empty else 0
+    kpis = kpis_desde_cubo(cubo_f)
+    total, tasa, ingreso = kpis['total'], kpis['tasa'], kpis['ingreso']
 
     st.markdown(f"""
         <div style="display: flex; justify-content: space-around; gap: 15px; margin-bottom: 25px;">
@@ -77,15 +362,33 @@ def render_rotacion_dashboard():
     st.markdown("<h3 style='text-align: center;'>Mapa de Talento: Edad vs Salario</h3>", unsafe_allow_html=True)
     st.markdown("<p style='text-align: center; color: #6B7280; font-size: 14px;'>Relación entre compensación y edad. Los puntos rojos indican fugas potenciales por competitividad.</p>", unsafe_allow_html=True)
     
-    fig_scat = px.scatter(
-        df, x='Age', y='MonthlyIncome', color='Estado',
-        hover_data={'Age': True, 'MonthlyIncome': ':$,.0f', 'JobRole': True},
-        color_discrete_map={'Renunció': '#EF5350', 'Activo': '#26A69A'},
-        labels={'Age': 'Edad', 'MonthlyIncome': 'Sueldo Mensual', 'Estado': 'Estado'},
-        height=500, template="plotly_white"
-    )
-    fig_scat.update_traces(marker=dict(size=10, opacity=0.7, line=dict(width=1, color='White')))
-    st.plotly_chart(fig_scat, use_container_width=True)
+    grilla = None
+    if servidor:
+        try:
+            grilla = load_mapa_servidor(version_servidor, genero_sel, contrato_sel, _token=token)
+        except Exception:
+            logger.exception("Mapa de talento del servidor no disponible; se calcula localmente")
+
+    if grilla is not None:
+        # Siempre como densidad: la grilla ya viene agregada
+        fig_scat, modo = _figura_densidad(grilla), "densidad"
+        bordes, limite = grilla["bordes"], LIMITE_CELDA
+        obtener_celda = lambda r_edad, r_sal: load_celda_servidor(version_servidor, genero_sel, contrato_sel, r_edad, r_sal, _token=token)
+    else:
+        if df_raw is None:
+            df_raw, version = load_consolidado_versionado()
+        mask = np.ones(len(df_raw), dtype=bool)
+        if genero_sel != 'Todos': mask &= (df_raw['Genero'] == genero_sel).to_numpy()
+        if contrato_sel != 'Todos': mask &= (df_raw['Tipocontrato'] == contrato_sel).to_numpy()
+        df = df_raw[mask]
+        fig_scat, modo = mapa_talento(df, version, genero_sel, contrato_sel)
+        bordes, limite = (_bordes_celdas(df) if modo == "densidad" else None), None
+        obtener_celda = lambda r_edad, r_sal: filas_celda(df, r_edad, r_sal)
+    mostrar_grafico(f"Mapa de talento ({modo})", fig_scat, use_container_width=True)
+
+    if modo == "densidad":
+        with st.expander("🔎 Explorar una celda del mapa"):
+            render_detalle_celda(bordes, obtener_celda, limite)
 
     st.markdown("---")
 
@@ -94,18 +397,18 @@ def render_rotacion_dashboard():
     with c1:
         st.markdown("<h3 style='text-align: center;'>Impacto de la Satisfacción</h3>", unsafe_allow_html=True)
         st.markdown("<p style='text-align: center; font-size: 13px;'>Niveles de felicidad reportados por quienes decidieron dejar la empresa.</p>", unsafe_allow_html=True)
-        df_sat = df[df['Estado'] == 'Renunció'].groupby('JobSatisfaction').size().reset_index(name='Cantidad')
+        df_sat = conteo_dimension(cubo_f, 'JobSatisfaction', estado='Renunció')
         fig_sat = px.bar(df_sat, x='JobSatisfaction', y='Cantidad', color_discrete_sequence=['#F87171'])
         fig_sat.update_layout(xaxis_title="Satisfacción (1-4)", yaxis_title="Bajas")
-        st.plotly_chart(fig_sat, use_container_width=True)
+        mostrar_grafico("Bajas por satisfacción", fig_sat, use_container_width=True)
 
     with c2:
         st.markdown("<h3 style='text-align: center;'>Equilibrio Vida-Trabajo</h3>", unsafe_allow_html=True)
         st.markdown("<p style='text-align: center; font-size: 13px;'>Análisis de cómo la conciliación personal afecta la retención.</p>", unsafe_allow_html=True)
-        df_wb = df[df['Estado'] == 'Renunció'].groupby('WorkLifeBalance').size().reset_index(name='Cantidad')
+        df_wb = conteo_dimension(cubo_f, 'WorkLifeBalance', estado='Renunció')
         fig_wb = px.bar(df_wb, x='WorkLifeBalance', y='Cantidad', color_discrete_sequence=['#FBBF24'])
         fig_wb.update_layout(xaxis_title="Balance (1-4)", yaxis_title="Bajas")
-        st.plotly_chart(fig_wb, use_container_width=True)
+        mostrar_grafico("Bajas por balance vida-trabajo", fig_wb, use_container_width=True)
 
     st.markdown("---")
 
@@ -114,37 +417,39 @@ def render_rotacion_dashboard():
     with c3:
         st.markdown("<h3 style='text-align: center;'>Tasa de Fuga por Área</h3>", unsafe_allow_html=True)
         st.markdown("<p style='text-align: center; font-size: 13px;'>Identificación de departamentos con mayor riesgo de rotación.</p>", unsafe_allow_html=True)
-        dept_churn = df.groupby('Departamento')['Estado'].value_counts(normalize=True).unstack().fillna(0)
+        dept_churn = tasa_fuga_por_area(cubo_f)
         if 'Renunció' in dept_churn.columns:
             fig_dept = px.bar(dept_churn, x=dept_churn.index, y='Renunció', color_discrete_sequence=['#FB923C'])
             fig_dept.update_layout(yaxis_tickformat='.0%', yaxis_title="% Salidas")
-            st.plotly_chart(fig_dept, use_container_width=True)
+            mostrar_grafico("Fuga por área", fig_dept, use_container_width=True)
 
     with c4:
         st.markdown("<h3 style='text-align: center;'>Frecuencia de Horas Extra</h3>", unsafe_allow_html=True)
         st.markdown("<p style='text-align: center; font-size: 13px;'>Peso de la carga laboral en el personal que renunció.</p>", unsafe_allow_html=True)
-        df_ren = df[df['Estado'] == 'Renunció']
-        fig_over = px.pie(df_ren, names='HorasExtra', hole=0.6, color_discrete_sequence=['#EF4444', '#60A5FA'])
-        st.plotly_chart(fig_over, use_container_width=True)
+        df_over = conteo_dimension(cubo_f, 'HorasExtra', estado='Renunció')
+        fig_over = px.pie(df_over, names='HorasExtra', values='Cantidad', hole=0.6, color_discrete_sequence=['#EF4444', '#60A5FA'])
+        mostrar_grafico("Horas extra", fig_over, use_container_width=True)
 
     # --- 4. ANTIGÜEDAD OVERLAY ---
     st.markdown("---")
     st.markdown("<h3 style='text-align: center;'>Ciclo de Permanencia en la Organización</h3>", unsafe_allow_html=True)
     st.markdown("<p style='text-align: center; color: #6B7280; font-size: 14px;'>Comparativa de antigüedad: ¿Perdemos talento nuevo o institucional?</p>", unsafe_allow_html=True)
+    df_anios = conteo_dimension(cubo_f, 'YearsAtCompany', por_estado=True)
     fig_hist = px.histogram(
-        df, x="YearsAtCompany", color="Estado", barmode="overlay",
+        df_anios, x="YearsAtCompany", y="Cantidad", histfunc="sum", color="Estado", barmode="overlay",
         color_discrete_map={'Renunció': '#EF4444', 'Activo': '#10B981'},
         labels={'YearsAtCompany': 'Años en Empresa'},
         height=400, template="plotly_white"
     )
-    st.plotly_chart(fig_hist, use_container_width=True)
+    fig_hist.update_layout(yaxis_title="Cantidad")
+    mostrar_grafico("Antigüedad por estado", fig_hist, use_container_width=True)
 
     # --- CONCLUSIÓN ---
     st.markdown("---")
     st.markdown("<h2 style='text-align: center; color: #1E3A8A;'>Interpretación Ejecutiva</h2>", unsafe_allow_html=True)
     
     try:
-        peor_area = df.groupby('Departamento')['Estado'].value_counts(normalize=True).unstack().fillna(0)['Renunció'].idxmax()
+        peor_area = dept_churn['Renunció'].idxmax()
     except:
         peor_area = "No disponible"
 
@@ -154,4 +459,5 @@ def render_rotacion_dashboard():
     """)
 
 if __name__ == "__main__":
+    st.set_page_config(layout="wide", page_title="Portal de Analítica de Talento")
     render_rotacion_dashboard()
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""Carga de los datasets compartidos (consolidado y encuestas).
+
+Sin plotly ni código de páginas: cache_swr lo importa al arrancar para
+precalentar, y cada página reutiliza estas cargas.
+"""
+import streamlit as st
+import pandas as pd
+import numpy as np
+import threading
+import time
+from supabase_client import leer_paginas_df
+from instrumentacion import instrumentar
+import snapshots
+import cache_swr
+import versiones
+
+# =================================================================
+# CONSOLIDADO (DASHBOARD DE ROTACIÓN)
+# =================================================================
+
+# Columnas que realmente usa el dashboard (proyección en la consulta)
+CLAVE_PAGINACION = "EmployeeNumber"
+COLUMNAS_CONSOLIDADO = [
+    CLAVE_PAGINACION, "Age", "MonthlyIncome", "Gender", "OverTime", "Department",
+    "JobRole", "JobSatisfaction", "WorkLifeBalance", "YearsAtCompany",
+    "FechaSalida", "Tipocontrato"
+]
+COLUMNAS_NUMERICAS = [
+    CLAVE_PAGINACION, "Age", "MonthlyIncome", "JobSatisfaction",
+    "WorkLifeBalance", "YearsAtCompany"
+]
+
+# Esquema compacto del DataFrame cacheado (Likert 1-4 en enteros pequeños)
+ESQUEMA_CONSOLIDADO = {
+    "EmployeeNumber": "Int32",
+    "Age": "Int16",
+    "MonthlyIncome": "float32",
+    "Gender": "category",
+    "OverTime": "category",
+    "Department": "category",
+    "JobRole": "category",
+    "JobSatisfaction": "Int8",
+    "WorkLifeBalance": "Int8",
+    "YearsAtCompany": "Int16",
+    "FechaSalida": "datetime64[ns]",
+    "Tipocontrato": "category",
+}
+TRADUCCION_GENERO = {'Male': 'Masculino', 'Female': 'Femenino'}
+TRADUCCION_HORAS_EXTRA = {'Yes': 'Sí', 'No': 'No'}
+TRADUCCION_DEPT = {
+    'Sales': 'Ventas',
+    'Research & Development': 'Investigación y Desarrollo',
+    'Human Resources': 'Recursos Humanos'
+}
+
+# Tipos declarados al lector CSV; las categorías se arman al normalizar.
+# La clave de paginación va como entero: es el cursor de la página siguiente.
+DTYPES_LECTURA = {col: "float64" for col in COLUMNAS_NUMERICAS}
+DTYPES_LECTURA[CLAVE_PAGINACION] = "Int64"
+
+def _bloque_tipado(bloque, numericas):
+    """Asegura columnas numéricas en una página (en CSV ya llegan tipadas; en JSON no)."""
+    for col in numericas:
+        if bloque[col].dtype.kind not in "fiu":
+            bloque[col] = pd.to_numeric(bloque[col], errors='coerce')
+    return bloque
+
+def _castear_columna(serie, tipo):
+    if tipo == "category":
+        return serie.astype("category")
+    if tipo.startswith("datetime64"):
+        return pd.to_datetime(serie, errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None).astype(tipo)
+    if tipo.startswith("float"):
+        return pd.to_numeric(serie, errors='coerce').astype(tipo)
+    # Enteros (nullable): se redondea por si llegan como float desde JSON
+    return pd.to_numeric(serie, errors='coerce').round().astype(tipo)
+
+def _traducir_categoria(serie, traduccion):
+    """Traduce las categorías sin materializar una copia de texto por fila."""
+    nuevas = [traduccion.get(c, c) for c in serie.cat.categories]
+    if len(set(nuevas)) == len(nuevas):
+        return serie.cat.rename_categories(nuevas)
+    return serie.astype(object).replace(traduccion).astype("category")
+
+def normalizar_consolidado(df, esquema=ESQUEMA_CONSOLIDADO):
+    """Castea el DataFrame al esquema compacto y agrega las columnas derivadas."""
+    df = df.copy()
+    # Estado se calcula sobre el valor crudo: cualquier fecha informada cuenta como salida
+    renuncio = df['FechaSalida'].notna().to_numpy()
+    for col, tipo in esquema.items():
+        if col in df.columns:
+            df[col] = _castear_columna(df[col], tipo)
+
+    df['Estado'] = pd.Categorical.from_codes(renuncio.astype('int8'), categories=['Activo', 'Renunció'])
+    df['Genero'] = _traducir_categoria(df['Gender'], TRADUCCION_GENERO)
+    df['HorasExtra'] = _traducir_categoria(df['OverTime'], TRADUCCION_HORAS_EXTRA)
+    df['Departamento'] = _traducir_categoria(df['Department'], TRADUCCION_DEPT)
+    return df
+
+TTL_CONSOLIDADO_SEG = 600
+
+def _descargar_consolidado():
+    # Cada página se tipa y se libera antes de pedir la siguiente
+    bloques = [
+        _bloque_tipado(bloque, COLUMNAS_NUMERICAS)
+        for bloque in leer_paginas_df("consolidado", COLUMNAS_CONSOLIDADO, CLAVE_PAGINACION, dtype=DTYPES_LECTURA)
+    ]
+    if not bloques:
+        df = pd.DataFrame(columns=COLUMNAS_CONSOLIDADO)
+    else:
+        df = pd.concat(bloques, ignore_index=True)
+    return normalizar_consolidado(df)
+
+@instrumentar("load_consolidado")
+def load_consolidado_versionado():
+    """(consolidado, versión servida); la versión indexa las cachés que dependen de él.
+
+    Solo se recarga cuando la sonda de versiones detecta un cambio en la tabla; si la
+    sonda falla se vuelve al vencimiento por TTL_CONSOLIDADO_SEG.
+    """
+    version = versiones.version_tabla("consolidado")
+    cargar = lambda: snapshots.obtener("consolidado", _descargar_consolidado, TTL_CONSOLIDADO_SEG, version)
+    return cache_swr.obtener_versionado("consolidado", cargar, TTL_CONSOLIDADO_SEG, version)
+
+def load_consolidado():
+    """Consolidado normalizado desde el snapshot Arrow compartido (no modificar en sitio).
+
+    Al cambiar la versión se sigue sirviendo el anterior mientras se recarga en segundo plano.
+    """
+    return load_consolidado_versionado()[0]
+
+def usar_agregados_servidor():
+    return bool(st.secrets.get("ROTACION_AGREGADOS_SERVIDOR", False))
+
+def precargar_consolidado():
+    """Precarga del arranque; en modo servidor el dashboard no necesita las filas."""
+    if not usar_agregados_servidor():
+        load_consolidado()
+
+# =================================================================
+# HISTORIAL DE ENCUESTAS
+# =================================================================
+
+# Las encuestas son append-only: se guarda un snapshot ordenado y solo se
+# piden las filas con id mayor a la marca de agua en cada sincronización.
+# El frame ordenado también se publica como snapshot Arrow (versión = id máximo)
+# para que otros procesos y los reinicios partan de disco y no de la API.
+# La sincronización se dispara cuando cambia el token de versiones.py; si el
+# conteo remoto no coincide con el local (filas borradas o editadas) se recarga completo.
+INTERVALO_SYNC_SEG = 600
+SNAPSHOT_ENCUESTAS = "encuestas"
+
+@st.cache_resource
+def _snapshot_encuestas() -> dict:
+    """Estado compartido entre sesiones: (frame ordenado, índice) + marca de agua."""
+    df = pd.DataFrame()
+    return {"datos": (df, construir_indice(df)), "max_id": None, "ultima_sync": 0.0, "lock": threading.Lock()}
+
+def _cargar_desde_disco(snap: dict):
+    """Adopta el snapshot de disco si otro proceso ya avanzó más allá de nuestra marca de agua."""
+    meta = snapshots.version(SNAPSHOT_ENCUESTAS)
+    if meta is None or (snap["max_id"] is not None and meta["version"] <= snap["max_id"]):
+        return
+    leido = snapshots.leer(SNAPSHOT_ENCUESTAS)
+    if leido is not None:
+        df, meta = leido
+        snap["datos"] = (df, construir_indice(df))
+        snap["max_id"] = meta["version"]
+
+def _fetch_encuestas(desde_id=None) -> pd.DataFrame:
+    """Trae las encuestas con id > desde_id, paginando por id."""
+    bloques = list(leer_paginas_df("encuestas", "*", "id", desde=desde_id))
+
+    if not bloques:
+        return pd.DataFrame()
+    df = pd.concat(bloques, ignore_index=True)
+    df["Fecha"] = pd.to_datetime(df["Fecha"])
+    return df.sort_values(["EmployeeNumber", "Fecha"], kind="mergesort").reset_index(drop=True)
+
+def _fusionar_ordenado(df: pd.DataFrame, nuevos: pd.DataFrame) -> pd.DataFrame:
+    """Inserta filas nuevas (ya ordenadas) en el frame ordenado sin reordenarlo completo."""
+    if df.empty:
+        return nuevos
+    emp = df["EmployeeNumber"].to_numpy()
+    emp_nuevos = nuevos["EmployeeNumber"].to_numpy()
+    pos = np.searchsorted(emp, emp_nuevos, side="right")
+
+    # Si llega una medición anterior a la última del empleado se cae al orden completo
+    previa = np.clip(pos - 1, 0, None)
+    mismo_emp = (pos > 0) & (emp[previa] == emp_nuevos)
+    if np.any(mismo_emp & (nuevos["Fecha"].to_numpy() < df["Fecha"].to_numpy()[previa])):
+        return (
+            pd.concat([df, nuevos], ignore_index=True)
+            .sort_values(["EmployeeNumber", "Fecha"], kind="mergesort")
+            .reset_index(drop=True)
+        )
+
+    orden = np.insert(np.arange(len(df)), pos, np.arange(len(df), len(df) + len(nuevos)))
+    return pd.concat([df, nuevos], ignore_index=True).take(orden).reset_index(drop=True)
+
+def construir_indice(df: pd.DataFrame) -> dict:
+    """Mapa EmployeeNumber -> tramo [inicio, fin) contiguo del frame ordenado."""
+    if df.empty:
+        return {"empleados": [], "tramos": {}}
+    emp = df["EmployeeNumber"].to_numpy()
+    cortes = np.flatnonzero(emp[1:] != emp[:-1]) + 1
+    inicios = np.concatenate(([0], cortes))
+    fines = np.concatenate((cortes, [len(emp)]))
+    empleados = emp[inicios].tolist()
+    return {
+        "empleados": empleados,
+        "tramos": dict(zip(empleados, zip(inicios.tolist(), fines.tolist())))
+    }
+
+def filas_empleado(df: pd.DataFrame, indice: dict, empleado_id) -> pd.DataFrame:
+    """Encuestas de un empleado en O(filas del empleado) usando el índice."""
+    inicio, fin = indice["tramos"].get(empleado_id, (0, 0))
+    return df.iloc[inicio:fin]
+
+def _sincronizar(snap: dict):
+    _cargar_desde_disco(snap)
+    nuevos = _fetch_encuestas(snap["max_id"])
+    if not nuevos.empty:
+        df = _fusionar_ordenado(snap["datos"][0], nuevos)
+        # Frame e índice se publican juntos para que ningún lector los vea desfasados
+        snap["datos"] = (df, construir_indice(df))
+        snap["max_id"] = int(nuevos["id"].max()) if snap["max_id"] is None else max(snap["max_id"], int(nuevos["id"].max()))
+        snapshots.escribir(SNAPSHOT_ENCUESTAS, df, snap["max_id"])
+    snap["ultima_sync"] = time.time()
+
+def _recargar_completo(snap: dict):
+    df = _fetch_encuestas()
+    snap["datos"] = (df, construir_indice(df))
+    snap["max_id"] = int(df["id"].max()) if not df.empty else None
+    if snap["max_id"] is not None:
+        snapshots.escribir(SNAPSHOT_ENCUESTAS, df, snap["max_id"])
+    snap["ultima_sync"] = time.time()
+
+def _actualizar_encuestas(sonda=None) -> tuple:
+    snap = _snapshot_encuestas()
+    with snap["lock"]:
+        _sincronizar(snap)
+        # El conteo de la sonda es de antes de sincronizar: se compara contra uno fresco hasta la marca de agua
+        if sonda is not None and snap["max_id"] is not None:
+            remotas = versiones.conteo_hasta("encuestas", snap["max_id"])
+            if remotas is not None and remotas != len(snap["datos"][0]):
+                _recargar_completo(snap)
+    return snap["datos"]
+
+@instrumentar("get_survey_snapshot", filas=lambda resultado: len(resultado[0][0]))
+def get_survey_snapshot_versionado() -> tuple:
+    """((historial ordenado, índice), versión servida)."""
+    sonda = versiones.sondear("encuestas")
+    try:
+        return cache_swr.obtener_versionado(
+            "encuestas", lambda: _actualizar_encuestas(sonda), INTERVALO_SYNC_SEG, sonda and sonda["token"]
+        )
+    except Exception as e:
+        st.error(f"❌ Error al consultar encuestas: {e}")
+        return _snapshot_encuestas()["datos"], None
+
+def get_survey_snapshot() -> tuple:
+    """Devuelve (historial ordenado, índice por empleado); no modificar en sitio.
+
+    Si la tabla cambió se sigue sirviendo la versión actual mientras se sincroniza en segundo plano.
+    """
+    return get_survey_snapshot_versionado()[0]
+
+def get_survey_data() -> pd.DataFrame:
+    """Devuelve el historial ordenado por EmployeeNumber y Fecha (no modificar en sitio)."""
+    return get_survey_snapshot()[0]
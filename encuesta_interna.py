@@ -1,5 +1,7 @@
 import streamlit as st
-from supabase import create_client, Client
+import sqlite3
+from supabase_client import insertar
+from cola_encuestas import encolar_respuesta
 
 def render_formulario_encuesta():
     # --- ESTILOS CSS AISLADOS ---
@@ -101,11 +103,6 @@ def render_formulario_encuesta():
 
         if submit:
             try:
-                # Conexión a Supabase
-                url = st.secrets["SUPABASE_URL"]
-                key = st.secrets["SUPABASE_KEY"]
-                supabase: Client = create_client(url, key)
-                
                 # Preparar datos para inserción
                 data_insert = {
                     "id_encuesta": "DASHBOARD_GENERAL",
@@ -117,8 +114,12 @@ def render_formulario_encuesta():
                     "observacion": observacion.strip() if observacion else "Sin comentario"
                 }
 
-                # Inserción en Supabase
-                supabase.table("encuestas_usabilidad").insert(data_insert).execute()
+                # Se guarda en el spool local y se envía en segundo plano por lotes;
+                # si el disco local no está disponible se inserta directamente.
+                try:
+                    encolar_respuesta(data_insert)
+                except (OSError, sqlite3.Error):
+                    insertar("encuestas_usabilidad", data_insert)
                 
                 st.success("✅ ¡Gracias! Tus respuestas han sido enviadas correctamente.")
                 st.balloons()
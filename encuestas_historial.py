@@ -1,74 +1,210 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from supabase import create_client, Client
+from supabase_client import get_supabase, ejecutar
+from instrumentacion import instrumentar, marcar_calculo, mostrar_grafico
+from datos import get_survey_snapshot_versionado, filas_empleado
+import motor_consultas
 from typing import Optional
+import hashlib
+import json
+import logging
+import math
+import os
 import warnings
 
 warnings.filterwarnings("ignore")
 
+logger = logging.getLogger(__name__)
+
 # =================================================================
 # 1. CONFIGURACIÓN Y CONEXIÓN A SUPABASE
 # =================================================================
 
-@st.cache_resource
-def get_supabase() -> Client:
-    url = st.secrets.get("SUPABASE_URL")
-    key = st.secrets.get("SUPABASE_KEY")
-    if not url or not key:
-        st.error("❌ Faltan credenciales de Supabase en secrets.toml")
-        st.stop()
-    return create_client(url, key)
+# El historial se sincroniza en datos.py (snapshot ordenado + índice por empleado)
 
-supabase = get_supabase()
+# =================================================================
+# 2. ANÁLISIS DE RIESGO
+# =================================================================
 
-@st.cache_data(ttl=600)
-def get_survey_data() -> pd.DataFrame:
+# Las reglas son datos: tabla `reglas_riesgo` en Supabase o reglas_riesgo.json.
+# Se compilan una vez en predicados vectorizados; cada regla aporta un bit a
+# la máscara de señales (bit i = regla i).
+RUTA_REGLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reglas_riesgo.json")
+TTL_REGLAS_SEG = 300
+OPERADORES = {"<=": np.less_equal, ">=": np.greater_equal, "<": np.less, ">": np.greater, "==": np.equal}
+NIVELES_POR_DEFECTO = [
+    {"nivel": "CRÍTICO", "min_senales": 2, "color": "#dc3545"},
+    {"nivel": "ADVERTENCIA", "min_senales": 1, "color": "#ffc107"},
+    {"nivel": "BAJO", "min_senales": 0, "color": "#28a745"},
+]
+
+def _numero(valor, minimo=None) -> bool:
     try:
-        response = (
-            supabase
-            .table("encuestas")
-            .select("*")
-            .order("EmployeeNumber")
-            .order("Fecha")
-            .execute()
-        )
-
-        if not response.data:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(response.data)
-        df["Fecha"] = pd.to_datetime(df["Fecha"])
-        return df
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(numero) and (minimo is None or numero >= minimo)
+
+def validar_regla(regla: dict) -> Optional[str]:
+    """Motivo por el que la regla no se puede compilar, o None si es válida."""
+    if regla.get("tipo") not in COMPILADORES:
+        return f"tipo desconocido {regla.get('tipo')!r}"
+    if not regla.get("columna") or not regla.get("mensaje"):
+        return "falta columna o mensaje"
+    if regla["tipo"] == "umbral":
+        if regla.get("op") not in OPERADORES:
+            return f"operador inválido {regla.get('op')!r}"
+        if not _numero(regla.get("umbral")):
+            return f"umbral inválido {regla.get('umbral')!r}"
+    elif not _numero(regla.get("ventana"), minimo=1) or not _numero(regla.get("caida")):
+        return "tendencia sin ventana (>= 1) o caída numérica"
+    return None
+
+def _reglas_validas(reglas: list, origen: str) -> list:
+    validas = []
+    for regla in reglas:
+        motivo = validar_regla(regla)
+        if motivo:
+            logger.warning("Regla de riesgo %r (%s) ignorada: %s", regla.get("id"), origen, motivo)
+        else:
+            validas.append(regla)
+    return validas
 
+def _cargar_config_reglas() -> dict:
+    """Reglas activas desde Supabase; si no hay tabla o ninguna es válida, desde el JSON local."""
+    with open(RUTA_REGLAS, encoding="utf-8") as f:
+        config = json.load(f)
+    try:
+        filas = ejecutar(get_supabase().table("reglas_riesgo").select("*").eq("activa", True).order("id")).data
     except Exception as e:
-        st.error(f"❌ Error al consultar encuestas: {e}")
-        return pd.DataFrame()
+        # Sin tabla reglas_riesgo o sin permisos de lectura
+        logger.info("Reglas de riesgo remotas no disponibles (%s); se usa %s", e, RUTA_REGLAS)
+        filas = []
+    remotas = _reglas_validas(filas or [], "Supabase")
+    if remotas:
+        config["reglas"] = remotas
+    elif filas:
+        logger.warning("Ninguna regla remota es válida; se usa %s", RUTA_REGLAS)
+    config.setdefault("niveles", NIVELES_POR_DEFECTO)
+    return config
+
+def _valores_columna(df, regla: dict):
+    """Columna de la regla como float64; None si el historial no la tiene."""
+    if regla["columna"] not in df.columns:
+        return None
+    return pd.to_numeric(df[regla["columna"]], errors="coerce").astype("float64")
+
+def _predicado_umbral(regla: dict):
+    op = OPERADORES[regla["op"]]
+    umbral = float(regla["umbral"])
+
+    def evaluar(df, es_ultima):
+        serie = _valores_columna(df, regla)
+        if serie is None:
+            return np.zeros(int(es_ultima.sum()), dtype=bool)
+        valores = serie.to_numpy()[es_ultima]
+        with np.errstate(invalid="ignore"):
+            return op(valores, umbral)
+    return evaluar
+
+def _predicado_tendencia(regla: dict):
+    """Caída de `caida` puntos o más entre el máximo de las últimas `ventana` encuestas y la última."""
+    ventana = int(regla["ventana"])
+    caida = float(regla["caida"])
+
+    def evaluar(df, es_ultima):
+        emp = df["EmployeeNumber"].to_numpy()
+        valores = _valores_columna(df, regla)
+        if valores is None:
+            return np.zeros(int(es_ultima.sum()), dtype=bool)
+        # Ventana por empleado: las `ventana` filas más recientes de cada tramo
+        en_ventana = (df.groupby(emp, sort=False).cumcount(ascending=False) < ventana).to_numpy()
+        maximo = valores[en_ventana].groupby(emp[en_ventana], sort=False).max()
+        maximo_ultimas = maximo.reindex(emp[es_ultima]).to_numpy()
+        with np.errstate(invalid="ignore"):
+            return (maximo_ultimas - valores.to_numpy()[es_ultima]) >= caida
+    return evaluar
+
+COMPILADORES = {"umbral": _predicado_umbral, "tendencia": _predicado_tendencia}
+
+def compilar_reglas(config: dict) -> dict:
+    """Convierte la configuración en predicados que operan sobre frames completos."""
+    reglas = _reglas_validas([r for r in config["reglas"] if r.get("activa", True)], "configuración")
+    niveles = sorted(config["niveles"], key=lambda n: n["min_senales"], reverse=True)
+    huella = hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return {
+        "reglas": reglas,
+        "predicados": [COMPILADORES[r["tipo"]](r) for r in reglas],
+        "niveles": niveles,
+        "colores": {n["nivel"]: n["color"] for n in niveles},
+        "huella": huella,
+    }
 
-# =================================================================
-# 2. ANÁLISIS DE RIESGO
-# =================================================================
+@st.cache_resource(ttl=TTL_REGLAS_SEG)
+def get_motor_riesgo() -> dict:
+    return compilar_reglas(_cargar_config_reglas())
+
+def evaluar_riesgo_lote(df: pd.DataFrame, motor: Optional[dict] = None) -> pd.DataFrame:
+    """Evalúa todas las reglas para todos los empleados del frame ordenado en una pasada."""
+    motor = motor or get_motor_riesgo()
+    emp = df["EmployeeNumber"].to_numpy()
+    es_ultima = np.append(emp[1:] != emp[:-1], True) if len(emp) else np.zeros(0, dtype=bool)
+
+    n_ultimas = int(es_ultima.sum())
+    mascara = np.zeros(n_ultimas, dtype=np.int64)
+    for bit, predicado in enumerate(motor["predicados"]):
+        mascara |= predicado(df, es_ultima).astype(np.int64) << bit
+
+    n_senales = np.zeros(n_ultimas, dtype=np.int8)
+    for bit in range(len(motor["predicados"])):
+        n_senales += ((mascara >> bit) & 1).astype(np.int8)
+
+    niveles = motor["niveles"]
+    riesgo = np.select(
+        [n_senales >= n["min_senales"] for n in niveles[:-1]],
+        [n["nivel"] for n in niveles[:-1]],
+        default=niveles[-1]["nivel"]
+    )
+    return pd.DataFrame({
+        "EmployeeNumber": emp[es_ultima],
+        "Fecha": df["Fecha"].to_numpy()[es_ultima],
+        "riesgo": riesgo,
+        "mascara": mascara,
+        "n_senales": n_senales,
+    })
+
+def senales_desde_mascara(mascara: int, motor: Optional[dict] = None) -> list:
+    motor = motor or get_motor_riesgo()
+    return [regla["mensaje"] for bit, regla in enumerate(motor["reglas"]) if (int(mascara) >> bit) & 1]
+
+@instrumentar("get_risk_table")
+@st.cache_data(max_entries=1)
+@marcar_calculo
+def get_risk_table(_df: pd.DataFrame, version: str, huella_reglas: str) -> pd.DataFrame:
+    """Tabla de riesgo de toda la plantilla; `version` (la servida junto a `_df`) y la huella de reglas invalidan la caché."""
+    return evaluar_riesgo_lote(_df)
+
+def top_riesgo(tabla: pd.DataFrame, n: int = 20) -> pd.DataFrame:
+    return tabla.sort_values(["n_senales", "Fecha"], ascending=[False, False], kind="mergesort").head(n)
 
 def get_risk_analysis(employee_data: pd.DataFrame):
-    """Analiza la última encuesta para determinar el nivel de riesgo."""
-    latest = employee_data.iloc[-1]
-    signals = []
-
-    if latest["IntencionPermanencia"] <= 2:
-        signals.append("Riesgo de salida (Baja intención de permanencia)")
-    if latest["ConfianzaEmpresa"] <= 2:
-        signals.append("Baja confianza en la organización")
-    if latest["CargaLaboralPercibida"] >= 4:
-        signals.append("Sobrecarga laboral detectada")
-    if latest["SatisfaccionSalarial"] <= 1:
-        signals.append("Insatisfacción salarial crítica")
-
-    if len(signals) >= 2:
-        return {"riesgo": "CRÍTICO", "color": "#dc3545", "señales": signals}
-    elif len(signals) == 1:
-        return {"riesgo": "ADVERTENCIA", "color": "#ffc107", "señales": signals}
-    else:
-        return {"riesgo": "BAJO", "color": "#28a745", "señales": []}
+    """Analiza la última encuesta (y la tendencia reciente) para determinar el nivel de riesgo."""
+    motor = get_motor_riesgo()
+    fila = evaluar_riesgo_lote(employee_data, motor).iloc[-1]
+    return {
+        "riesgo": fila["riesgo"],
+        "color": motor["colores"][fila["riesgo"]],
+        "señales": senales_desde_mascara(fila["mascara"], motor)
+    }
+
+def umbral_regla(columna: str, por_defecto: float) -> float:
+    """Umbral vigente de la regla de tipo umbral sobre `columna` (para dibujarlo en los gráficos)."""
+    for regla in get_motor_riesgo()["reglas"]:
+        if regla["tipo"] == "umbral" and regla["columna"] == columna:
+            return float(regla["umbral"])
+    return por_defecto
 
 # =================================================================
 # 3. VISUALIZACIONES
@@ -116,7 +252,7 @@ def create_radar_chart(data: pd.Series):
 def historial_encuestas_module():
     st.title("📜 Historial de Encuestas por Empleado")
 
-    df_maestro = get_survey_data()
+    (df_maestro, indice), version = get_survey_snapshot_versionado()
 
     if df_maestro.empty:
         st.warning("No existen encuestas registradas en la base de datos.")
@@ -139,12 +275,35 @@ def historial_encuestas_module():
         "NumeroFaltas": "Faltas"
     }
 
+    # Ranking de riesgo de toda la organización (una sola pasada vectorizada)
+    with st.expander("🚨 Colaboradores con mayor riesgo en la organización"):
+        tabla_riesgo = get_risk_table(df_maestro, version or len(df_maestro), get_motor_riesgo()["huella"])
+        conteo = tabla_riesgo["riesgo"].value_counts()
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Riesgo crítico", int(conteo.get("CRÍTICO", 0)))
+        k2.metric("Advertencia", int(conteo.get("ADVERTENCIA", 0)))
+        k3.metric("Riesgo bajo", int(conteo.get("BAJO", 0)))
+        top_n = st.slider("Mostrar los N de mayor riesgo", 5, 100, 20, step=5)
+        df_top = top_riesgo(tabla_riesgo, top_n).copy()
+        df_top["Señales"] = [", ".join(senales_desde_mascara(m)) for m in df_top["mascara"]]
+        df_top["Fecha"] = pd.to_datetime(df_top["Fecha"]).dt.strftime("%d/%m/%Y")
+        st.dataframe(
+            df_top.drop(columns=["mascara"]).rename(columns={
+                "EmployeeNumber": "ID Empleado", "Fecha": "Última Encuesta",
+                "riesgo": "Riesgo", "n_senales": "N.º Señales"
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
     # Selector de empleado
-    empleados = sorted(df_maestro["EmployeeNumber"].unique())
-    empleado_id = st.selectbox("Seleccione el ID del Colaborador:", empleados)
+    empleado_id = st.selectbox("Seleccione el ID del Colaborador:", indice["empleados"])
 
-    # Filtrar datos del empleado
-    data_emp = df_maestro[df_maestro["EmployeeNumber"] == empleado_id].copy()
+    # Filtrar datos del empleado (tramo contiguo del frame ordenado, o SQL con DuckDB)
+    if motor_consultas.motor_activo() == "duckdb":
+        data_emp = motor_consultas.historial_empleado(df_maestro, empleado_id)
+    else:
+        data_emp = filas_empleado(df_maestro, indice, empleado_id).copy()
     data_emp["Fecha_str"] = data_emp["Fecha"].dt.strftime("%d/%m/%Y")
     
     # Análisis
@@ -184,7 +343,7 @@ def historial_encuestas_module():
 
     with c_radar:
         st.subheader("🎡 Perfil Actual de Satisfacción")
-        st.plotly_chart(create_radar_chart(ultima), use_container_width=True)
+        mostrar_grafico("Radar de satisfacción", create_radar_chart(ultima), use_container_width=True)
 
     with c_line:
         st.subheader("📈 Evolución: Intención de Permanencia")
@@ -198,7 +357,7 @@ def historial_encuestas_module():
             marker=dict(size=10)
         ))
         # Línea de umbral crítico
-        fig_line.add_hline(y=2, line_dash="dash", line_color="#dc3545", 
+        fig_line.add_hline(y=umbral_regla("IntencionPermanencia", 2), line_dash="dash", line_color="#dc3545", 
                           annotation_text="Límite Crítico", annotation_position="bottom right")
         
         fig_line.update_layout(
@@ -207,7 +366,7 @@ def historial_encuestas_module():
             xaxis=dict(title="Fecha de Encuesta"),
             margin=dict(l=20, r=20, t=20, b=20)
         )
-        st.plotly_chart(fig_line, use_container_width=True)
+        mostrar_grafico("Evolución de respuestas", fig_line, use_container_width=True)
 
     st.divider()
 
@@ -0,0 +1,214 @@
+"""Arnés local del modo servidor del dashboard de rotación.
+
+Carga sql/rotacion_agregados.sql en un Postgres local con un consolidado
+sintético y compara, para cada combinación de filtros, lo que devuelven las
+RPC (vía supabase_client.rpc y un PostgREST simulado en memoria) con el
+cálculo en pandas: cubo (construir_cubo), grilla del mapa de talento
+(grilla_talento) y detalle de celda. También verifica que las RPC rechacen
+la clave anon y respondan con el JWT de un usuario (rol authenticated).
+
+Requiere psycopg (3) y un Postgres: --dsn postgresql://usuario@localhost/base,
+o sin --dsn levanta uno temporal con `pgserver` (pip install pgserver).
+Todo se crea en el esquema `harness_rotacion`, que se borra al terminar.
+
+Uso: python harness_rotacion.py [--dsn DSN] [n_filas]
+"""
+import argparse
+import decimal
+import json
+import os
+import re
+import tempfile
+from unittest import mock
+import httpx
+import numpy as np
+import pandas as pd
+from supabase import create_client, ClientOptions
+import supabase_client
+import dashboard_rotacion as dr
+import datos
+
+ESQUEMA = "harness_rotacion"
+RUTA_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "rotacion_agregados.sql")
+
+DDL_CONSOLIDADO = """
+create table consolidado (
+    "EmployeeNumber" integer primary key,
+    "Age" integer,
+    "MonthlyIncome" numeric,
+    "Gender" text,
+    "OverTime" text,
+    "Department" text,
+    "JobRole" text,
+    "JobSatisfaction" integer,
+    "WorkLifeBalance" integer,
+    "YearsAtCompany" integer,
+    "FechaSalida" date,
+    "Tipocontrato" text
+)
+"""
+
+# Roles de Supabase a los que el script otorga permisos
+ROLES = """
+do $$
+begin
+    if not exists (select from pg_roles where rolname = 'anon') then create role anon nologin; end if;
+    if not exists (select from pg_roles where rolname = 'authenticated') then create role authenticated nologin; end if;
+end $$
+"""
+
+def _consolidado_sintetico(n, rng):
+    """Filas crudas como en Supabase, con algunos nulos para cubrir esos casos."""
+    df = pd.DataFrame({
+        "EmployeeNumber": np.arange(1, n + 1),
+        "Age": rng.integers(18, 65, n),
+        "MonthlyIncome": rng.integers(1_000, 20_000, n).astype(float),
+        "Gender": rng.choice(["Male", "Female"], n),
+        "OverTime": rng.choice(["Yes", "No"], n),
+        "Department": rng.choice(["Sales", "Research & Development", "Human Resources"], n),
+        "JobRole": rng.choice(["Analyst", "Manager", "Technician"], n),
+        "JobSatisfaction": rng.integers(1, 5, n),
+        "WorkLifeBalance": rng.integers(1, 5, n),
+        "YearsAtCompany": rng.integers(0, 40, n),
+        "FechaSalida": np.where(rng.random(n) < 0.16, "2024-06-30", None),
+        "Tipocontrato": rng.choice(["Indefinido", "Plazo fijo"], n),
+    })
+    df["MonthlyIncome"] = df["MonthlyIncome"].where(rng.random(n) > 0.02)
+    df["JobSatisfaction"] = df["JobSatisfaction"].astype("Int64").where(rng.random(n) > 0.02)
+    return df[datos.COLUMNAS_CONSOLIDADO]
+
+# --- POSTGRES ---
+def _conectar(dsn):
+    import psycopg
+    if dsn:
+        return psycopg.connect(dsn, autocommit=True), None
+    import pgserver
+    servidor = pgserver.get_server(tempfile.mkdtemp(prefix="harness_rotacion_"), cleanup_mode="delete")
+    return psycopg.connect(servidor.get_uri(), autocommit=True), servidor
+
+def _preparar_base(con, crudo):
+    con.execute(f"drop schema if exists {ESQUEMA} cascade")
+    con.execute(f"create schema {ESQUEMA}")
+    con.execute(f"set search_path to {ESQUEMA}")
+    con.execute(ROLES)
+    con.execute(DDL_CONSOLIDADO)
+    # Como en Supabase: las tablas del esquema quedan legibles por ambos roles (el RLS filtra)
+    con.execute(f"grant usage on schema {ESQUEMA} to anon, authenticated")
+    con.execute("grant select on consolidado to anon, authenticated")
+    columnas = ", ".join(f'"{c}"' for c in crudo.columns)
+    with con.cursor().copy(f"copy consolidado ({columnas}) from stdin with (format csv, header true)") as copia:
+        copia.write(crudo.to_csv(index=False))
+    with open(RUTA_SQL, encoding="utf-8") as f:
+        con.execute(f.read())
+
+# --- POSTGREST SIMULADO: POST /rest/v1/rpc/<función> con argumentos por nombre ---
+# El rol sale del Authorization: el JWT del usuario -> authenticated; la clave del proyecto -> anon
+CLAVE_ANON = "harness.clave.local"
+TOKEN_USUARIO = "harness.jwt.usuario"
+
+def _json_postgres(valor):
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    raise TypeError(type(valor))
+
+def _postgrest_simulado(con):
+    import psycopg
+    def responder(request):
+        coincidencia = re.search(r"/rpc/(\w+)$", request.url.path)
+        if request.method != "POST" or not coincidencia:
+            return httpx.Response(404, json={"message": "solo se simulan RPC"})
+        # Como PostgREST: los valores llegan como texto y Postgres los castea al tipo del parámetro
+        args = {nombre: None if valor is None else str(valor) for nombre, valor in json.loads(request.content or b"{}").items()}
+        firma = ", ".join(f"{nombre} => %({nombre})s" for nombre in args)
+        rol = "authenticated" if request.headers.get("Authorization") == f"Bearer {TOKEN_USUARIO}" else "anon"
+        try:
+            with con.transaction():
+                con.execute(f"set local role {rol}")
+                cursor = con.execute(f"select * from {coincidencia.group(1)}({firma})", args)
+                nombres = [c.name for c in cursor.description]
+                filas = [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+        except psycopg.errors.InsufficientPrivilege as e:
+            return httpx.Response(401, json={"code": "42501", "message": str(e)})
+        return httpx.Response(200, content=json.dumps(filas, default=_json_postgres),
+                              headers={"Content-Type": "application/json"})
+    return responder
+
+# --- COMPARACIONES ---
+def _cubo_comparable(cubo):
+    cubo = cubo.copy()
+    for col in dr.LLAVES_CUBO + ["dimension"]:
+        cubo[col] = cubo[col].astype(str)
+    cubo["valor"] = [None if pd.isna(v) else str(v) for v in cubo["valor"]]
+    cubo = cubo[cubo["cantidad"] > 0].sort_values(dr.LLAVES_CUBO + ["dimension", "valor"], na_position="first")
+    return cubo.reset_index(drop=True)
+
+def _comparar_cubos(local, servidor, etiqueta):
+    a, b = _cubo_comparable(local), _cubo_comparable(servidor)
+    assert len(a) == len(b), f"{etiqueta}: {len(a)} filas locales vs {len(b)} del servidor"
+    for col in dr.LLAVES_CUBO + ["dimension", "valor", "cantidad", "ingreso_n"]:
+        assert a[col].tolist() == b[col].tolist(), f"{etiqueta}: difiere {col}"
+    assert np.allclose(a["ingreso_suma"], b["ingreso_suma"]), f"{etiqueta}: difiere ingreso_suma"
+    assert dr.kpis_desde_cubo(local) == dr.kpis_desde_cubo(servidor), f"{etiqueta}: difieren los KPIs"
+
+def _comparar_grillas(local, servidor, etiqueta):
+    for lado in range(2):
+        assert np.allclose(local["bordes"][lado], servidor["bordes"][lado]), f"{etiqueta}: difieren los bordes"
+    for estado in dr.ESTADOS_MAPA:
+        assert (local["conteos"][estado] == servidor["conteos"][estado]).all(), f"{etiqueta}: difiere la grilla {estado}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="Postgres existente (por defecto se levanta uno con pgserver)")
+    parser.add_argument("n_filas", nargs="?", type=int, default=5_000)
+    args = parser.parse_args()
+
+    crudo = _consolidado_sintetico(args.n_filas, np.random.default_rng(11))
+    local = datos.normalizar_consolidado(crudo.copy())
+    cubo_local = dr.construir_cubo(local)
+
+    con, servidor = _conectar(args.dsn)
+    try:
+        _preparar_base(con, crudo)
+        cliente = httpx.Client(transport=httpx.MockTransport(_postgrest_simulado(con)))
+        supabase = create_client("http://postgrest.local", CLAVE_ANON, ClientOptions(httpx_client=cliente))
+        generos = ["Todos"] + sorted(local["Genero"].dropna().unique().tolist())
+        contratos = ["Todos"] + sorted(local["Tipocontrato"].dropna().unique().tolist())
+        with mock.patch.object(supabase_client, "get_supabase", lambda: supabase):
+            # Con la clave pública (anon) las RPC se rechazan
+            celda = {"p_genero": None, "p_contrato": None, "p_edad_min": 0, "p_edad_max": 99,
+                     "p_salario_min": 0, "p_salario_max": 1e9}
+            for funcion, params in [("rotacion_cubo", {}), ("rotacion_mapa_talento", {}), ("rotacion_celda", celda)]:
+                try:
+                    supabase_client.rpc(funcion, params, token=CLAVE_ANON)
+                except httpx.HTTPStatusError as e:
+                    assert e.response.status_code == 401, f"{funcion}: {e}"
+                else:
+                    raise AssertionError(f"{funcion} accesible con la clave anon")
+            for genero in generos:
+                for contrato in contratos:
+                    etiqueta = f"{genero} / {contrato}"
+                    cubo_f = dr.filtrar_cubo(cubo_local, genero, contrato)
+                    _comparar_cubos(cubo_f, dr.load_cubo_servidor("arnes", genero, contrato, _token=TOKEN_USUARIO), etiqueta)
+
+                    mask = np.ones(len(local), dtype=bool)
+                    if genero != "Todos": mask &= (local["Genero"] == genero).to_numpy()
+                    if contrato != "Todos": mask &= (local["Tipocontrato"] == contrato).to_numpy()
+                    filtrado = local[mask]
+                    grilla = dr.load_mapa_servidor("arnes", genero, contrato, _token=TOKEN_USUARIO)
+                    _comparar_grillas(dr.grilla_talento(filtrado), grilla, etiqueta)
+
+                    bordes_edad, bordes_sal = grilla["bordes"]
+                    r_edad, r_sal = (bordes_edad[5], bordes_edad[6]), (bordes_sal[5], bordes_sal[6])
+                    celda = dr.load_celda_servidor("arnes", genero, contrato, r_edad, r_sal, _token=TOKEN_USUARIO)
+                    esperadas = min(len(dr.filas_celda(filtrado, r_edad, r_sal)), dr.LIMITE_CELDA)
+                    assert len(celda) == esperadas, f"{etiqueta}: celda con {len(celda)} filas, se esperaban {esperadas}"
+                    print(f"OK {etiqueta:<25} cubo {len(cubo_f):>4} filas, celda {len(celda)} filas")
+    finally:
+        con.execute(f"drop schema if exists {ESQUEMA} cascade")
+        con.close()
+        if servidor is not None:
+            servidor.cleanup()
+    print("Modo servidor equivalente al cálculo en pandas.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import streamlit as st
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# =================================================================
+# INSTRUMENTACIÓN DE RENDIMIENTO
+# Tiempos, filas, aciertos de caché y tamaño de figuras en un buffer
+# circular en memoria (por proceso), visible para administradores.
+# =================================================================
+
+MAX_REGISTROS = 2000
+CAMPOS = ["momento", "pagina", "etapa", "ms", "filas", "cache", "bytes_figura"]
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_lock = threading.Lock()
+_local = threading.local()
+
+def _pagina_actual():
+    try:
+        return st.session_state.get("current_page")
+    except Exception:
+        # Hilos y procesos en segundo plano no tienen sesión
+        return None
+
+def registrar(etapa: str, segundos: float, filas=None, cache=None, bytes_figura=None):
+    with _lock:
+        _registros.append({
+            "momento": time.time(), "pagina": _pagina_actual(), "etapa": etapa,
+            "ms": round(segundos * 1000, 2), "filas": filas, "cache": cache, "bytes_figura": bytes_figura,
+        })
+
+def registros() -> list:
+    with _lock:
+        return list(_registros)
+
+def detalle_activo() -> bool:
+    """El tamaño serializado de las figuras cuesta serializar otra vez: solo si se pide."""
+    try:
+        return bool(st.session_state.get("instrumentacion_detalle", False))
+    except Exception:
+        return False
+
+@contextmanager
+def medir(etapa: str, filas=None):
+    """Mide un bloque; se pueden completar `filas`, `cache` o `bytes_figura` en el dict devuelto."""
+    datos = {"filas": filas, "cache": None, "bytes_figura": None}
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        registrar(etapa, time.perf_counter() - inicio, **datos)
+
+def _contar_filas(resultado):
+    if isinstance(resultado, tuple) and resultado:
+        resultado = resultado[0]
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+def marcar_calculo(func):
+    """Va debajo de @st.cache_data: si se ejecuta, la llamada fue un fallo de caché."""
+    @functools.wraps(func)
+    def envoltura(*args, **kwargs):
+        _local.calculado = True
+        return func(*args, **kwargs)
+    return envoltura
+
+def instrumentar(etapa: str = None, filas=_contar_filas, tamano=None):
+    """Decorador: registra tiempo, filas devueltas y acierto/fallo de caché (con `marcar_calculo`)."""
+    def decorador(func):
+        nombre = etapa or func.__name__
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            previo = getattr(_local, "calculado", None)
+            _local.calculado = False
+            inicio = time.perf_counter()
+            try:
+                resultado = func(*args, **kwargs)
+            finally:
+                segundos = time.perf_counter() - inicio
+                calculado, _local.calculado = _local.calculado, previo
+            cache = None
+            if hasattr(func, "clear"):  # Funciones envueltas por st.cache_data / cache_resource
+                cache = "fallo" if calculado else "acierto"
+            registrar(nombre, segundos, filas=filas(resultado) if filas else None, cache=cache,
+                      bytes_figura=tamano(resultado) if tamano else None)
+            return resultado
+        return envoltura
+    return decorador
+
+def mostrar_grafico(etapa: str, fig, **kwargs):
+    """st.plotly_chart con medición del envío (serialización incluida)."""
+    tamano = len(fig.to_json()) if detalle_activo() else None
+    with medir(f"gráfico: {etapa}") as datos:
+        datos["bytes_figura"] = tamano
+        st.plotly_chart(fig, **kwargs)
+
+# --- PANEL PARA ADMINISTRADORES ---
+def render_panel_instrumentacion():
+    import pandas as pd
+    with st.sidebar.expander("📈 Rendimiento"):
+        st.toggle("Medir tamaño de figuras", key="instrumentacion_detalle")
+        df = pd.DataFrame(registros(), columns=CAMPOS)
+        if df.empty:
+            st.caption("Sin mediciones aún.")
+            return
+        resumen = df.groupby("etapa").agg(
+            llamadas=("ms", "size"),
+            ms_prom=("ms", "mean"),
+            ms_p95=("ms", lambda s: s.quantile(0.95)),
+            aciertos=("cache", lambda s: int((s == "acierto").sum())),
+            fallos=("cache", lambda s: int((s == "fallo").sum())),
+            kb_figura=("bytes_figura", lambda s: s.dropna().mean() / 1024 if s.notna().any() else None),
+        ).sort_values("ms_prom", ascending=False).round(1)
+        st.dataframe(resumen, use_container_width=True)
+        df["momento"] = pd.to_datetime(df["momento"], unit="s")
+        c1, c2 = st.columns(2)
+        c1.download_button("JSON", data=json.dumps(registros(), default=str), file_name="instrumentacion.json",
+                           mime="application/json", use_container_width=True)
+        c2.download_button("CSV", data=df.to_csv(index=False), file_name="instrumentacion.csv",
+                           mime="text/csv", use_container_width=True)
@@ -0,0 +1,89 @@
+import streamlit as st
+import threading
+
+try:
+    import duckdb
+    DUCKDB_DISPONIBLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_DISPONIBLE = False
+
+# =================================================================
+# MOTOR DE CONSULTAS ANALÍTICAS (pandas o DuckDB embebido)
+# MOTOR_CONSULTAS = "duckdb" en secrets.toml ejecuta el cubo de rotación y
+# el historial por empleado como SQL sobre los snapshots en memoria; con
+# "pandas" (por defecto) se usan las máscaras y groupby de cada página.
+# =================================================================
+
+MOTORES = ("pandas", "duckdb")
+
+def motor_activo() -> str:
+    motor = str(st.secrets.get("MOTOR_CONSULTAS", "pandas")).lower()
+    if motor not in MOTORES or (motor == "duckdb" and not DUCKDB_DISPONIBLE):
+        return "pandas"
+    return motor
+
+@st.cache_resource
+def _estado_duckdb() -> dict:
+    """Una base en memoria por proceso; DuckDB paraleliza cada consulta en todos los núcleos."""
+    return {"con": duckdb.connect(":memory:"), "lock": threading.Lock(), "tablas": {}}
+
+def consultar(sql: str, tablas: dict, params=None):
+    """Ejecuta `sql` registrando los DataFrames de `tablas` como vistas (sin copiarlos).
+
+    Una vista se vuelve a registrar solo si cambió el objeto (nueva versión del snapshot).
+    """
+    estado = _estado_duckdb()
+    # La conexión no admite consultas concurrentes desde varios hilos
+    with estado["lock"]:
+        for nombre, df in tablas.items():
+            if estado["tablas"].get(nombre) is not df:
+                estado["con"].register(nombre, df)
+                estado["tablas"][nombre] = df
+        return estado["con"].execute(sql, params or []).fetchdf()
+
+# --- ROTACIÓN: mismo cubo que construir_cubo() / rotacion_cubo() en Postgres ---
+SQL_CUBO_ROTACION = """
+select
+    "Genero"::varchar as "Genero",
+    "Tipocontrato"::varchar as "Tipocontrato",
+    "Estado"::varchar as "Estado",
+    case
+        when grouping("JobSatisfaction") = 0 then 'JobSatisfaction'
+        when grouping("WorkLifeBalance") = 0 then 'WorkLifeBalance'
+        when grouping("Departamento") = 0 then 'Departamento'
+        when grouping("HorasExtra") = 0 then 'HorasExtra'
+        when grouping("YearsAtCompany") = 0 then 'YearsAtCompany'
+        else '__total__'
+    end as dimension,
+    -- En cada grouping set solo una dimensión es no nula
+    coalesce("JobSatisfaction"::varchar, "WorkLifeBalance"::varchar, "Departamento"::varchar,
+             "HorasExtra"::varchar, "YearsAtCompany"::varchar) as valor,
+    count(*) as cantidad,
+    sum("MonthlyIncome"::double) as ingreso_suma,
+    count("MonthlyIncome") as ingreso_n
+from consolidado
+where ($1 is null or "Genero" = $1)
+  and ($2 is null or "Tipocontrato" = $2)
+group by grouping sets (
+    ("Genero", "Tipocontrato", "Estado"),
+    ("Genero", "Tipocontrato", "Estado", "JobSatisfaction"),
+    ("Genero", "Tipocontrato", "Estado", "WorkLifeBalance"),
+    ("Genero", "Tipocontrato", "Estado", "Departamento"),
+    ("Genero", "Tipocontrato", "Estado", "HorasExtra"),
+    ("Genero", "Tipocontrato", "Estado", "YearsAtCompany")
+)
+"""
+
+def cubo_rotacion(consolidado, genero_sel='Todos', contrato_sel='Todos') -> list:
+    """Filas del cubo filtrado (Genero, Tipocontrato, Estado, dimension, valor, cantidad, ingreso_suma, ingreso_n)."""
+    params = [None if genero_sel == 'Todos' else genero_sel, None if contrato_sel == 'Todos' else contrato_sel]
+    res = consultar(SQL_CUBO_ROTACION, {"consolidado": consolidado}, params)
+    return list(res.itertuples(index=False, name=None))
+
+# --- ENCUESTAS: historial de un empleado ---
+def historial_empleado(encuestas, empleado_id):
+    return consultar(
+        'select * from encuestas where "EmployeeNumber" = $1 order by "Fecha"',
+        {"encuestas": encuestas}, [empleado_id]
+    )
@@ -0,0 +1,103 @@
+import streamlit as st
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# =================================================================
+# REGISTRO DE PÁGINAS CON CARGA DIFERIDA
+# Cada módulo se importa la primera vez que se navega a su página, así el
+# login no paga plotly, matplotlib, wordcloud ni fpdf.
+# =================================================================
+
+# Nombre visible -> (módulo, función de render, roles con acceso). El orden es el del menú.
+PAGINAS = {
+    "Dashboard": ("dashboard_rotacion", "render_rotacion_dashboard", ("admin", "analista")),
+    "Historial de Encuesta": ("encuestas_historial", "historial_encuestas_module", ("admin", "analista", "auditor")),
+    "Calificar Dashboard": ("encuesta_interna", "render_formulario_encuesta", ("admin", "analista", "auditor")),
+    "Módulo de Usabilidad": ("usabilidad_module", "render_modulo_usabilidad", ("admin",)),
+}
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+TOP_PAQUETES = 6
+MODULOS_LOCALES = {os.path.splitext(f)[0] for f in os.listdir(DIRECTORIO_APP) if f.endswith(".py")}
+
+# Medición en proceso: segundos y módulos nuevos en la primera importación de cada página
+_cargas = {}
+
+def paginas_para_rol(rol: str) -> list:
+    return [nombre for nombre, (_, _, roles) in PAGINAS.items() if rol in roles]
+
+def cargar_pagina(nombre: str):
+    """Importa (una sola vez por proceso) el módulo de la página y devuelve su función de render."""
+    modulo, funcion, _ = PAGINAS[nombre]
+    if modulo not in sys.modules:
+        antes, inicio = len(sys.modules), time.perf_counter()
+        importlib.import_module(modulo)
+        _cargas[nombre] = {"segundos": time.perf_counter() - inicio, "modulos_nuevos": len(sys.modules) - antes}
+    return getattr(sys.modules[modulo], funcion)
+
+def render_pagina(nombre: str):
+    try:
+        render = cargar_pagina(nombre)
+    except ImportError as e:
+        st.error(f"Error al importar módulos: {e}")
+        return
+    render()
+
+# --- PERFIL DE IMPORTACIÓN (equivalente a `python -X importtime`) ---
+# pandas se importa dentro de estas funciones: el login no lo necesita
+def _parsear_importtime(salida: str):
+    """Convierte el stderr de -X importtime en filas (paquete, propio_ms, acumulado_ms, nivel)."""
+    import pandas as pd
+    filas = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        filas.append({"paquete": nombre.strip(), "propio_ms": int(propio) / 1000,
+                      "acumulado_ms": int(acumulado) / 1000, "nivel": nivel})
+    return pd.DataFrame(filas, columns=["paquete", "propio_ms", "acumulado_ms", "nivel"])
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def perfil_importacion(modulo: str):
+    """Importa el módulo en un intérprete limpio con -X importtime y devuelve el detalle."""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=DIRECTORIO_APP, capture_output=True, text=True, timeout=120
+    )
+    return _parsear_importtime(proceso.stderr)
+
+def reporte_importacion():
+    """Resumen por página: tiempo en frío, paquetes más pesados y medición en este proceso."""
+    import pandas as pd
+    filas = []
+    base = perfil_importacion("streamlit")
+    ya_cargados = set(base["paquete"])
+    for nombre, (modulo, _, _) in PAGINAS.items():
+        detalle = perfil_importacion(modulo)
+        total = detalle.loc[detalle["paquete"] == modulo, "acumulado_ms"].sum()
+        # Paquetes raíz que la página agrega sobre lo que ya carga streamlit (el login)
+        raices = detalle[~detalle["paquete"].str.contains(".", regex=False)
+                         & ~detalle["paquete"].isin(ya_cargados)
+                         & ~detalle["paquete"].isin(MODULOS_LOCALES)]
+        pesados = raices.nlargest(TOP_PAQUETES, "acumulado_ms")
+        en_proceso = _cargas.get(nombre, {})
+        filas.append({
+            "Página": nombre,
+            "Módulo": modulo,
+            "Importación en frío (ms)": round(total, 1),
+            "Paquetes más pesados": ", ".join(f"{p} ({ms:.0f} ms)" for p, ms in zip(pesados["paquete"], pesados["acumulado_ms"])),
+            "Carga en este proceso (ms)": round(en_proceso["segundos"] * 1000, 1) if en_proceso else None,
+            "Módulos nuevos": en_proceso.get("modulos_nuevos"),
+        })
+    return pd.DataFrame(filas)
+
+if __name__ == "__main__":
+    # Uso: python paginas.py  -> imprime el reporte de importación por página
+    import pandas as pd
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_colwidth", 120)
+    print(reporte_importacion().drop(columns=["Carga en este proceso (ms)", "Módulos nuevos"]).to_string(index=False))
@@ -0,0 +1,223 @@
+import streamlit as st
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from functools import partial
+from almacen_local import DIRECTORIO_DATOS, conectar_sqlite, ruta
+
+# =================================================================
+# COLA DE TRABAJOS DE REPORTES (PDF por cohorte en procesos aparte)
+# El script de Streamlit solo encola; un pool de procesos genera cada PDF,
+# registra el avance en SQLite y empaqueta los artefactos en un ZIP.
+# =================================================================
+
+ARCHIVO_TRABAJOS = "reportes.db"
+MAX_PROCESOS = max(1, min(4, (os.cpu_count() or 2) - 1))
+EN_CURSO, TERMINADO, ERROR, INTERRUMPIDO = "en_curso", "terminado", "error", "interrumpido"
+# Trabajos terminados (y sus PDF y ZIP) que se conservan en disco
+RETENCION_SEG = float(os.environ.get("DASHBI_REPORTES_RETENCION_DIAS", "7")) * 86400
+# Identifica este arranque: tras un reinicio el PID puede repetirse (p. ej. en contenedores)
+_PROCESO = uuid.uuid4().hex
+
+# Etiqueta -> columna de las filas puntuadas; "Mes" se deriva de la fecha.
+# No hay cohortes por departamento ni por contrato: las respuestas de usabilidad
+# solo traen el correo de la sesión, sin un vínculo con el colaborador del consolidado.
+DIMENSIONES_COHORTE = {
+    "Encuesta": "id_encuesta",
+    "Mes": "fecha",
+}
+
+_ESQUEMA = """
+create table if not exists trabajos (
+    id text primary key,
+    descripcion text not null,
+    estado text not null,
+    total integer not null,
+    completados integer not null default 0,
+    errores integer not null default 0,
+    ultimo_error text,
+    archivo text,
+    creado real not null,
+    terminado real,
+    pid integer,
+    proceso text
+)
+"""
+
+def _conexion():
+    conn = conectar_sqlite(ARCHIVO_TRABAJOS)
+    conn.execute(_ESQUEMA)
+    # Bases creadas antes de registrar el proceso dueño de cada trabajo
+    columnas = {fila[1] for fila in conn.execute("pragma table_info(trabajos)")}
+    for columna, tipo in (("pid", "integer"), ("proceso", "text")):
+        if columna not in columnas:
+            conn.execute(f"alter table trabajos add column {columna} {tipo}")
+    return conn
+
+def _proceso_vivo(pid) -> bool:
+    if pid is None or pid == os.getpid():
+        return False  # Sin dueño registrado, o un arranque anterior con el mismo PID
+    if os.name == "nt":
+        return True  # os.kill terminaría el proceso en Windows: se asume vivo
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _marcar_interrumpidos():
+    """Los trabajos en curso de procesos que ya no existen no van a terminar."""
+    with closing(_conexion()) as conn:
+        huerfanos = [
+            (INTERRUMPIDO, trabajo, EN_CURSO)
+            for trabajo, pid, proceso in conn.execute(
+                "select id, pid, proceso from trabajos where estado = ?", (EN_CURSO,)
+            ).fetchall()
+            if proceso != _PROCESO and not _proceso_vivo(pid)
+        ]
+        conn.executemany("update trabajos set estado = ? where id = ? and estado = ?", huerfanos)
+
+def _barrer_antiguos():
+    """Borra los trabajos cerrados hace más de RETENCION_SEG junto con sus PDF y su ZIP."""
+    limite = time.time() - RETENCION_SEG
+    with closing(_conexion()) as conn:
+        viejos = [trabajo for (trabajo,) in conn.execute(
+            "select id from trabajos where estado != ? and coalesce(terminado, creado) < ?", (EN_CURSO, limite)
+        ).fetchall()]
+        for trabajo in viejos:
+            shutil.rmtree(os.path.join(DIRECTORIO_DATOS, "reportes", trabajo), ignore_errors=True)
+            try:
+                os.remove(os.path.join(DIRECTORIO_DATOS, "reportes", f"{trabajo}.zip"))
+            except FileNotFoundError:
+                pass
+        conn.executemany("delete from trabajos where id = ?", [(trabajo,) for trabajo in viejos])
+
+@st.cache_resource
+def _estado_pool() -> dict:
+    """Una vez por proceso: cierra los trabajos de procesos muertos y barre los antiguos."""
+    _marcar_interrumpidos()
+    _barrer_antiguos()
+    return {"pool": None, "lock": threading.Lock()}
+
+def _pool() -> ProcessPoolExecutor:
+    """Pool compartido por el proceso; se crea al primer uso y tras descartar uno roto."""
+    estado = _estado_pool()
+    with estado["lock"]:
+        if estado["pool"] is None:
+            # spawn: los hijos no heredan hilos ni sockets del servidor de Streamlit
+            estado["pool"] = ProcessPoolExecutor(max_workers=MAX_PROCESOS, mp_context=multiprocessing.get_context("spawn"))
+        return estado["pool"]
+
+def _descartar_pool(roto: ProcessPoolExecutor):
+    """Si un hijo murió el pool ya no acepta tareas: el próximo _pool() crea otro."""
+    estado = _estado_pool()
+    with estado["lock"]:
+        if estado["pool"] is roto:
+            estado["pool"] = None
+    roto.shutdown(wait=False, cancel_futures=True)
+
+def _enviar(trabajo: str, nombre: str, grupo):
+    pool = _pool()
+    try:
+        futuro = pool.submit(_generar_cohorte, trabajo, nombre, grupo)
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        pool = _pool()
+        futuro = pool.submit(_generar_cohorte, trabajo, nombre, grupo)
+    futuro.add_done_callback(partial(_al_terminar, trabajo, nombre, pool))
+
+def dimensiones_disponibles(filas) -> list:
+    return [etiqueta for etiqueta, col in DIMENSIONES_COHORTE.items() if col in filas.columns]
+
+def _cohortes(filas, dimension):
+    columna = DIMENSIONES_COHORTE[dimension]
+    claves = filas[columna].dt.strftime("%Y-%m") if dimension == "Mes" else filas[columna].fillna("Sin dato").astype(str)
+    return [(str(nombre), grupo) for nombre, grupo in filas.groupby(claves, sort=True)]
+
+def _nombre_archivo(nombre: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", nombre).strip("_") or "cohorte"
+
+def _empaquetar(trabajo: str) -> str:
+    carpeta = os.path.dirname(ruta("reportes", trabajo, "x"))
+    destino = ruta("reportes", f"{trabajo}.zip")
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre in sorted(os.listdir(carpeta)):
+            if nombre.endswith(".pdf"):
+                zf.write(os.path.join(carpeta, nombre), nombre)
+    return destino
+
+def _registrar_avance(trabajo: str, error: str = None):
+    """Suma una cohorte terminada; la última en llegar cierra el trabajo y arma el ZIP."""
+    with closing(_conexion()) as conn:
+        conn.execute("begin immediate")
+        if error:
+            conn.execute("update trabajos set errores = errores + 1, ultimo_error = ? where id = ?", (error, trabajo))
+        else:
+            conn.execute("update trabajos set completados = completados + 1 where id = ?", (trabajo,))
+        completados, errores, total = conn.execute(
+            "select completados, errores, total from trabajos where id = ?", (trabajo,)
+        ).fetchone()
+        conn.execute("commit")
+        if completados + errores < total:
+            return
+        archivo = _empaquetar(trabajo) if completados else None
+        conn.execute(
+            "update trabajos set estado = ?, archivo = ?, terminado = ? where id = ?",
+            (TERMINADO if completados else ERROR, archivo, time.time(), trabajo)
+        )
+
+def _generar_cohorte(trabajo: str, nombre: str, df):
+    """Se ejecuta en un proceso del pool: arma el PDF de una cohorte y lo deja en disco."""
+    try:
+        from usabilidad_module import pdf_cohorte
+        destino = ruta("reportes", trabajo, f"{_nombre_archivo(nombre)}.pdf")
+        temporal = f"{destino}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(pdf_cohorte(df, cohorte=nombre))
+        os.replace(temporal, destino)
+    except Exception as e:
+        _registrar_avance(trabajo, f"{nombre}: {e}")
+    else:
+        _registrar_avance(trabajo)
+
+def _al_terminar(trabajo: str, nombre: str, pool: ProcessPoolExecutor, futuro):
+    # Solo llega aquí una excepción si el proceso hijo murió (p. ej. sin memoria)
+    if not futuro.cancelled() and futuro.exception() is not None:
+        if isinstance(futuro.exception(), BrokenProcessPool):
+            _descartar_pool(pool)
+        _registrar_avance(trabajo, f"{nombre}: {futuro.exception()}")
+
+def encolar_trabajo(filas, dimension: str) -> str:
+    """Registra el trabajo y reparte una cohorte por tarea; devuelve el id sin esperar."""
+    _estado_pool()
+    _barrer_antiguos()
+    cohortes = _cohortes(filas, dimension)
+    trabajo = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    with closing(_conexion()) as conn:
+        conn.execute(
+            "insert into trabajos (id, descripcion, estado, total, creado, ultimo_error, pid, proceso) "
+            "values (?, ?, ?, ?, ?, ?, ?, ?)",
+            (trabajo, f"Usabilidad por {dimension}", EN_CURSO if cohortes else ERROR, len(cohortes), time.time(),
+             None if cohortes else "Sin evaluaciones para agrupar", os.getpid(), _PROCESO)
+        )
+    if not cohortes:
+        return trabajo
+    for nombre, grupo in cohortes:
+        _enviar(trabajo, nombre, grupo)
+    return trabajo
+
+def trabajos_recientes(limite: int = 5) -> list:
+    _marcar_interrumpidos()
+    with closing(_conexion()) as conn:
+        conn.row_factory = lambda cursor, fila: {c[0]: v for c, v in zip(cursor.description, fila)}
+        return conn.execute("select * from trabajos order by creado desc limit ?", (limite,)).fetchall()
@@ -0,0 +1,120 @@
+import hashlib
+import multiprocessing
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from almacen_local import conectar_sqlite
+
+# =================================================================
+# SERVICIO DE SENTIMIENTO CON CACHÉ PERSISTENTE
+# Cada comentario se normaliza y se identifica por el hash de su texto;
+# el modelo solo corre sobre comentarios nunca vistos, en lotes.
+# =================================================================
+
+PALABRAS_POSITIVAS = ['excelente', 'bueno', 'facil', 'util', 'satisfecho', 'bien']
+PALABRAS_NEGATIVAS = ['lento', 'error', 'complejo', 'dificil', 'malo', 'engorroso']
+SIN_COMENTARIO = {"", "sin comentario", "nan"}
+# Cambiar el modelo o las listas de palabras exige subir la versión (invalida la caché)
+VERSION_MODELO = "textblob+kw-1"
+ARCHIVO_CACHE = "sentimiento.db"
+UMBRAL_PROCESOS = 500     # A partir de cuántos comentarios nuevos se usa el pool
+TAMANO_CONSULTA = 500     # Límite de parámetros por consulta SQLite
+MAX_MEMORIA = 50_000      # Resultados recientes en memoria (LRU); el resto queda en SQLite
+
+# Un solo patrón para ambas listas; el grupo indica la polaridad de la coincidencia
+_PATRON_CLAVES = re.compile(
+    "(?P<pos>" + "|".join(map(re.escape, PALABRAS_POSITIVAS)) + ")|"
+    "(?P<neg>" + "|".join(map(re.escape, PALABRAS_NEGATIVAS)) + ")"
+)
+_ESPACIOS = re.compile(r"\s+")
+_memoria = OrderedDict()
+_lock = threading.Lock()
+
+def normalizar(texto) -> str:
+    if texto is None:
+        return ""
+    return _ESPACIOS.sub(" ", unicodedata.normalize("NFC", str(texto))).strip().lower()
+
+def huella(texto_normalizado: str) -> str:
+    return hashlib.sha1(f"{VERSION_MODELO}|{texto_normalizado}".encode("utf-8")).hexdigest()
+
+def etiquetar(score: float) -> str:
+    return "Positivo" if score > 0.1 else "Negativo" if score < -0.1 else "Neutral"
+
+def puntuar(texto_normalizado: str) -> float:
+    """Polaridad de TextBlob ajustada por las palabras clave del dominio."""
+    from textblob import TextBlob
+    score = TextBlob(texto_normalizado).sentiment.polarity
+    grupos = {m.lastgroup for m in _PATRON_CLAVES.finditer(texto_normalizado)}
+    if "pos" in grupos: score += 0.2
+    if "neg" in grupos: score -= 0.2
+    return score
+
+def _conexion():
+    conn = conectar_sqlite(ARCHIVO_CACHE)
+    conn.execute("create table if not exists sentimiento (huella text primary key, etiqueta text, score real)")
+    return conn
+
+def _buscar_en_disco(conn, huellas: list) -> dict:
+    encontrados = {}
+    for i in range(0, len(huellas), TAMANO_CONSULTA):
+        lote = huellas[i:i + TAMANO_CONSULTA]
+        marcadores = ",".join("?" * len(lote))
+        for h, etiqueta, score in conn.execute(
+            f"select huella, etiqueta, score from sentimiento where huella in ({marcadores})", lote
+        ):
+            encontrados[h] = (etiqueta, score)
+    return encontrados
+
+def _recordar(valores: dict):
+    with _lock:
+        for h, valor in valores.items():
+            _memoria[h] = valor
+            _memoria.move_to_end(h)
+        while len(_memoria) > MAX_MEMORIA:
+            _memoria.popitem(last=False)
+
+def analizar_lote(textos, usar_procesos: bool = True) -> list:
+    """Devuelve [(etiqueta, score)] para cada texto, calculando solo los no vistos."""
+    normalizados = [normalizar(t) for t in textos]
+    huellas = [huella(n) for n in normalizados]
+
+    # Copia local: el LRU puede desalojar entradas de este mismo lote
+    conocidos = {}
+    with _lock:
+        for h, n in zip(huellas, normalizados):
+            if n not in SIN_COMENTARIO and h in _memoria:
+                _memoria.move_to_end(h)
+                conocidos[h] = _memoria[h]
+
+    pendientes = {h: n for h, n in zip(huellas, normalizados) if n not in SIN_COMENTARIO and h not in conocidos}
+    if pendientes:
+        with closing(_conexion()) as conn:
+            conocidos.update(_buscar_en_disco(conn, list(pendientes)))
+            nuevos = [(h, n) for h, n in pendientes.items() if h not in conocidos]
+            if nuevos:
+                textos_nuevos = [n for _, n in nuevos]
+                if usar_procesos and len(nuevos) >= UMBRAL_PROCESOS:
+                    # spawn: se llama desde hilos del servidor (recarga en segundo plano)
+                    # y fork con varios hilos vivos puede dejar locks tomados en el hijo
+                    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as pool:
+                        scores = list(pool.map(puntuar, textos_nuevos, chunksize=64))
+                else:
+                    scores = [puntuar(n) for n in textos_nuevos]
+                resultados = {h: (etiquetar(s), s) for (h, _), s in zip(nuevos, scores)}
+                conn.execute("begin")
+                conn.executemany(
+                    "insert or replace into sentimiento (huella, etiqueta, score) values (?, ?, ?)",
+                    [(h, e, s) for h, (e, s) in resultados.items()]
+                )
+                conn.execute("commit")
+                conocidos.update(resultados)
+        _recordar({h: conocidos[h] for h in pendientes})
+
+    return [
+        ("Neutral", 0.0) if n in SIN_COMENTARIO else conocidos[h]
+        for h, n in zip(huellas, normalizados)
+    ]
@@ -0,0 +1,113 @@
+import streamlit as st
+import re
+import threading
+import time
+from supabase_client import get_supabase, get_supabase_auth, ejecutar
+
+# =================================================================
+# CACHÉ DE SESIÓN DE AUTENTICACIÓN
+# El token validado y sus datos quedan en session_state hasta que expiran,
+# así los reruns no consultan a Supabase Auth. Se renueva en el primer rerun
+# que llega cerca del vencimiento: sin hilos, una sesión abandonada (pestaña
+# cerrada sin logout) simplemente deja de renovarse.
+# =================================================================
+
+MARGEN_RENOVACION_SEG = 120   # Renovar el token este tiempo antes de que expire
+REINTENTO_RENOVACION_SEG = 30 # Espera tras una renovación fallida
+TTL_SIN_SESION_SEG = 30       # Resultado negativo de get_session() cacheado
+TTL_PERFILES_SEG = 60
+PATRON_CORREO = re.compile(r"^[^@\s]+@[^@\s]+\.[a-z]{2,}$")
+_CLAVE = "auth_cache"
+
+def _expiracion(sesion) -> float:
+    if getattr(sesion, "expires_at", None):
+        return float(sesion.expires_at)
+    return time.time() + float(getattr(sesion, "expires_in", 0) or 0)
+
+def _por_renovar(cache: dict) -> bool:
+    ahora = time.time()
+    return (bool(cache["refresh_token"]) and cache["expira"] - MARGEN_RENOVACION_SEG <= ahora
+            and cache.get("proximo_intento", 0) <= ahora)
+
+def _renovar(cache: dict):
+    """Renueva el token con el refresh token; si falla, vence solo y se pedirá login de nuevo."""
+    with cache["lock"]:
+        if not _por_renovar(cache):
+            return  # Otro rerun de la misma sesión ya lo intentó
+        try:
+            resp = get_supabase_auth().auth.refresh_session(cache["refresh_token"])
+            sesion = resp.session if resp else None
+        except Exception:
+            sesion = None
+        if sesion is None:
+            cache["proximo_intento"] = time.time() + REINTENTO_RENOVACION_SEG
+            return
+        cache.update(access_token=sesion.access_token, refresh_token=sesion.refresh_token,
+                     expira=_expiracion(sesion), usuario=sesion.user or cache["usuario"])
+
+def guardar_sesion(sesion):
+    """Guarda token, refresh token y usuario validados."""
+    cerrar_sesion_local()
+    cache = {
+        "access_token": sesion.access_token,
+        "refresh_token": sesion.refresh_token,
+        "expira": _expiracion(sesion),
+        "usuario": sesion.user,
+        "lock": threading.Lock(),
+    }
+    st.session_state[_CLAVE] = cache
+    st.session_state.pop("auth_sin_sesion_hasta", None)
+
+def sesion_vigente():
+    """Usuario de la sesión cacheada si el token sigue vigente (renovándolo si está por
+    vencer); None si no hay o ya venció."""
+    cache = st.session_state.get(_CLAVE)
+    if not cache:
+        return None
+    if _por_renovar(cache):
+        _renovar(cache)
+    if cache["expira"] > time.time():
+        return cache["usuario"]
+    return None
+
+def token_acceso():
+    """JWT vigente de la sesión (para llamadas con el rol del usuario); None si no hay."""
+    if sesion_vigente() is None:
+        return None
+    return st.session_state[_CLAVE]["access_token"]
+
+def sesion_vencida() -> bool:
+    """True si hubo sesión cacheada pero expiró sin poder renovarse (intenta renovarla antes)."""
+    return _CLAVE in st.session_state and sesion_vigente() is None
+
+def recuperar_sesion():
+    """Usuario autenticado usando la caché; solo consulta a Supabase si no hay dato reciente."""
+    usuario = sesion_vigente()
+    if usuario is not None:
+        return usuario
+    if st.session_state.get("auth_sin_sesion_hasta", 0) > time.time():
+        return None
+    resp = get_supabase_auth().auth.get_session()
+    # supabase-py v2 devuelve la sesión directamente; versiones previas la envolvían
+    sesion = getattr(resp, "session", resp)
+    if sesion and getattr(sesion, "user", None):
+        guardar_sesion(sesion)
+        return sesion.user
+    st.session_state["auth_sin_sesion_hasta"] = time.time() + TTL_SIN_SESION_SEG
+    return None
+
+def cerrar_sesion_local():
+    st.session_state.pop(_CLAVE, None)
+
+# --- VALIDACIÓN DE REGISTRO ---
+def correo_valido(email: str) -> bool:
+    return bool(PATRON_CORREO.match(email or ""))
+
+@st.cache_data(ttl=TTL_PERFILES_SEG, show_spinner=False)
+def correo_registrado(email: str) -> bool:
+    """Consulta memoizada a `profiles`; solo se llama con correos de formato válido."""
+    try:
+        return len(ejecutar(get_supabase().table("profiles").select("email").eq("email", email).limit(1)).data) > 0
+    except Exception:
+        # Si la tabla profiles no existe aún o no tienes permisos de lectura
+        return False
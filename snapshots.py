@@ -0,0 +1,172 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from almacen_local import ruta
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    DISPONIBLE = True
+except ImportError:  # Sin pyarrow se usa solo la caché en memoria del proceso
+    pa = None
+    DISPONIBLE = False
+
+# =================================================================
+# SNAPSHOTS COLUMNARES COMPARTIDOS ENTRE PROCESOS (Arrow IPC)
+# Cada versión se escribe en su propio archivo .arrow y un puntero JSON
+# indica la vigente. Los procesos mapean el archivo en memoria y solo lo
+# vuelven a leer cuando cambia la versión del puntero.
+# =================================================================
+
+logger = logging.getLogger(__name__)
+
+CARPETA = "snapshots"
+VERSIONES_CONSERVADAS = 2  # La vigente y la anterior (puede seguir mapeada por otro proceso)
+
+_lock = threading.Lock()
+_memoria = {}  # nombre -> (version, DataFrame)
+
+def _ruta_puntero(nombre: str) -> str:
+    return ruta(CARPETA, f"{nombre}.json")
+
+def _escribir_atomico(destino: str, datos: bytes):
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+    os.replace(temporal, destino)
+
+def version(nombre: str):
+    """Metadatos de la versión vigente ({version, archivo, escrito, filas}) o None."""
+    try:
+        with open(_ruta_puntero(nombre), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _limpiar(nombre: str, vigente: str):
+    archivos = sorted(glob.glob(ruta(CARPETA, f"{nombre}-*.arrow")), key=os.path.getmtime, reverse=True)
+    for archivo in archivos[VERSIONES_CONSERVADAS:]:
+        if os.path.basename(archivo) != vigente:
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+def escribir(nombre: str, df, version_datos) -> bool:
+    """Publica `df` como nueva versión: primero el archivo de datos, luego el puntero."""
+    if not DISPONIBLE:
+        return False
+    archivo = f"{nombre}-{time.time_ns()}-{os.getpid()}.arrow"
+    destino = ruta(CARPETA, archivo)
+    temporal = f"{destino}.tmp"
+    try:
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        # Sin compresión: el archivo se puede mapear y leer sin copiar los buffers
+        with pa.OSFile(temporal, "wb") as sink, pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+        os.replace(temporal, destino)
+        meta = {"version": version_datos, "archivo": archivo, "escrito": time.time(), "filas": len(df)}
+        _escribir_atomico(_ruta_puntero(nombre), json.dumps(meta).encode("utf-8"))
+    except (OSError, pa.ArrowException) as e:
+        # Sin snapshot el proceso sigue funcionando con su copia en memoria
+        logger.warning("No se pudo escribir el snapshot %s: %s", nombre, e)
+        return False
+    with _lock:
+        _memoria[nombre] = (version_datos, df)
+    _limpiar(nombre, archivo)
+    return True
+
+def leer(nombre: str):
+    """(DataFrame, metadatos) de la versión vigente; reutiliza el frame si la versión no cambió."""
+    if not DISPONIBLE:
+        return None
+    meta = version(nombre)
+    if meta is None:
+        return None
+    with _lock:
+        en_memoria = _memoria.get(nombre)
+    if en_memoria and en_memoria[0] == meta["version"]:
+        return en_memoria[1], meta
+    try:
+        fuente = pa.memory_map(ruta(CARPETA, meta["archivo"]), "r")
+        tabla = pa.ipc.open_file(fuente).read_all()
+    except (OSError, pa.ArrowInvalid) as e:
+        # El archivo pudo limpiarse entre leer el puntero y abrirlo
+        logger.warning("Snapshot %s no disponible: %s", nombre, e)
+        return None
+    # split_blocks evita consolidar columnas: las numéricas sin nulos quedan sobre el mapa
+    df = tabla.to_pandas(split_blocks=True)
+    with _lock:
+        _memoria[nombre] = (meta["version"], df)
+    return df, meta
+
+@contextmanager
+def _bloqueo_recarga(nombre: str, esperar: bool):
+    """Lock de archivo entre procesos; entrega False si otro proceso ya está recargando."""
+    if fcntl is None:
+        yield True
+        return
+    with open(ruta(CARPETA, f"{nombre}.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _vigente(leido, max_edad_seg: float, version_datos=None) -> bool:
+    if leido is None:
+        return False
+    if version_datos is not None:
+        return leido[1]["version"] == version_datos
+    return time.time() - leido[1]["escrito"] < max_edad_seg
+
+def obtener(nombre: str, cargar, max_edad_seg: float, version_datos=None):
+    """Snapshot vigente si coincide con `version_datos` (o, sin versión, si tiene menos de
+    `max_edad_seg`); si no, llama a `cargar()` y lo publica con esa versión.
+
+    Solo un proceso recarga a la vez: los demás sirven el snapshot anterior (o esperan
+    si no hay ninguno). Si la descarga falla se sirve el anterior aunque esté vencido.
+    """
+    if not DISPONIBLE:
+        with _lock:
+            en_memoria = _memoria.get(nombre)
+        if en_memoria and time.time() - en_memoria[0] < max_edad_seg:
+            return en_memoria[1]
+        df = cargar()
+        with _lock:
+            _memoria[nombre] = (time.time(), df)
+        return df
+
+    leido = leer(nombre)
+    if _vigente(leido, max_edad_seg, version_datos):
+        return leido[0]
+    with _bloqueo_recarga(nombre, esperar=leido is None) as propio:
+        if not propio:
+            return leido[0]
+        # Otro proceso pudo publicar una versión nueva mientras esperábamos el lock
+        reciente = leer(nombre)
+        if _vigente(reciente, max_edad_seg, version_datos):
+            return reciente[0]
+        try:
+            df = cargar()
+        except Exception:
+            if leido is None:
+                raise
+            logger.exception("Falló la recarga de %s; se usa el snapshot anterior", nombre)
+            return leido[0]
+        if not escribir(nombre, df, version_datos if version_datos is not None else time.time()):
+            with _lock:
+                _memoria[nombre] = (time.time(), df)
+        return df
@@ -0,0 +1,11 @@
+-- =================================================================
+-- CLAVE DE IDEMPOTENCIA PARA LA COLA DE ENCUESTAS SUS
+-- cola_encuestas.py inserta por lotes con on_conflict=idempotency_key,
+-- de modo que reintentar un lote no duplica respuestas.
+-- =================================================================
+
+alter table encuestas_usabilidad
+    add column if not exists idempotency_key uuid;
+
+create unique index if not exists encuestas_usabilidad_idempotency_key_idx
+    on encuestas_usabilidad (idempotency_key);
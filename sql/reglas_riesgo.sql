@@ -0,0 +1,34 @@
+-- =================================================================
+-- REGLAS DE RIESGO EDITABLES (Historial de Encuestas)
+-- Si la tabla existe y tiene reglas activas, reemplaza a las de
+-- reglas_riesgo.json sin necesidad de desplegar la aplicación.
+-- =================================================================
+
+create table if not exists reglas_riesgo (
+    id text primary key,
+    tipo text not null check (tipo in ('umbral', 'tendencia')),
+    columna text not null,
+    op text check (op in ('<=', '>=', '<', '>', '==')),
+    umbral numeric,
+    ventana integer,
+    caida numeric,
+    mensaje text not null,
+    activa boolean not null default true
+);
+
+-- Cada tipo exige sus parámetros (también en tablas creadas antes de esta restricción)
+alter table reglas_riesgo drop constraint if exists reglas_riesgo_parametros_check;
+alter table reglas_riesgo add constraint reglas_riesgo_parametros_check check (
+    (tipo = 'umbral' and op is not null and umbral is not null)
+    or (tipo = 'tendencia' and ventana is not null and ventana >= 1 and caida is not null)
+);
+
+insert into reglas_riesgo (id, tipo, columna, op, umbral, ventana, caida, mensaje) values
+    ('permanencia_baja', 'umbral', 'IntencionPermanencia', '<=', 2, null, null, 'Riesgo de salida (Baja intención de permanencia)'),
+    ('confianza_baja', 'umbral', 'ConfianzaEmpresa', '<=', 2, null, null, 'Baja confianza en la organización'),
+    ('sobrecarga', 'umbral', 'CargaLaboralPercibida', '>=', 4, null, null, 'Sobrecarga laboral detectada'),
+    ('salario_critico', 'umbral', 'SatisfaccionSalarial', '<=', 1, null, null, 'Insatisfacción salarial crítica'),
+    ('caida_permanencia', 'tendencia', 'IntencionPermanencia', null, null, 3, 2, 'Caída de 2+ puntos en intención de permanencia en las últimas encuestas')
+on conflict (id) do nothing;
+
+grant select on reglas_riesgo to anon, authenticated;
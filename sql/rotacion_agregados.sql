@@ -0,0 +1,151 @@
+-- =================================================================
+-- AGREGADOS DEL DASHBOARD DE ROTACIÓN (modo servidor)
+-- Ejecutar en el SQL Editor de Supabase. El dashboard los usa cuando
+-- ROTACION_AGREGADOS_SERVIDOR = true en secrets.toml.
+-- =================================================================
+
+-- Vista normalizada: mismas traducciones que normalizar_consolidado().
+-- security_invoker: se consulta con el rol de quien llama y respeta el RLS de consolidado
+create or replace view v_rotacion with (security_invoker = true) as
+select
+    case "Gender" when 'Male' then 'Masculino' when 'Female' then 'Femenino' else "Gender" end as genero,
+    "Tipocontrato"::text as tipocontrato,
+    case when "FechaSalida" is not null then 'Renunció' else 'Activo' end as estado,
+    "JobSatisfaction"::text as job_satisfaction,
+    "WorkLifeBalance"::text as work_life_balance,
+    case "Department"
+        when 'Sales' then 'Ventas'
+        when 'Research & Development' then 'Investigación y Desarrollo'
+        when 'Human Resources' then 'Recursos Humanos'
+        else "Department"
+    end as departamento,
+    case "OverTime" when 'Yes' then 'Sí' else "OverTime" end as horas_extra,
+    "YearsAtCompany"::text as years_at_company,
+    "MonthlyIncome"::numeric as monthly_income,
+    -- Al final para que create or replace view acepte las columnas nuevas
+    "Age"::numeric as age,
+    "JobRole"::text as job_role
+from consolidado;
+
+-- Cubo filtrado: mismo formato que construir_cubo() en dashboard_rotacion.py
+create or replace function rotacion_cubo(p_genero text default null, p_contrato text default null)
+returns table (
+    "Genero" text,
+    "Tipocontrato" text,
+    "Estado" text,
+    dimension text,
+    valor text,
+    cantidad bigint,
+    ingreso_suma numeric,
+    ingreso_n bigint
+)
+language sql
+stable
+as $$
+    select
+        genero,
+        tipocontrato,
+        estado,
+        case
+            when grouping(job_satisfaction) = 0 then 'JobSatisfaction'
+            when grouping(work_life_balance) = 0 then 'WorkLifeBalance'
+            when grouping(departamento) = 0 then 'Departamento'
+            when grouping(horas_extra) = 0 then 'HorasExtra'
+            when grouping(years_at_company) = 0 then 'YearsAtCompany'
+            else '__total__'
+        end as dimension,
+        -- En cada grouping set solo una dimensión es no nula
+        coalesce(job_satisfaction, work_life_balance, departamento, horas_extra, years_at_company) as valor,
+        count(*) as cantidad,
+        sum(monthly_income) as ingreso_suma,
+        count(monthly_income) as ingreso_n
+    from v_rotacion
+    where (p_genero is null or genero = p_genero)
+      and (p_contrato is null or tipocontrato = p_contrato)
+    group by grouping sets (
+        (genero, tipocontrato, estado),
+        (genero, tipocontrato, estado, job_satisfaction),
+        (genero, tipocontrato, estado, work_life_balance),
+        (genero, tipocontrato, estado, departamento),
+        (genero, tipocontrato, estado, horas_extra),
+        (genero, tipocontrato, estado, years_at_company)
+    );
+$$;
+
+-- Mapa de talento: grilla Edad x Salario por Estado, mismos bordes que
+-- np.histogram_bin_edges() (último tramo cerrado a la derecha)
+create or replace function rotacion_mapa_talento(
+    p_genero text default null, p_contrato text default null,
+    p_bins_edad int default 20, p_bins_salario int default 25
+)
+returns table (
+    estado text,
+    bin_edad int,
+    bin_salario int,
+    cantidad bigint,
+    edad_min numeric,
+    edad_max numeric,
+    salario_min numeric,
+    salario_max numeric
+)
+language sql
+stable
+as $$
+    with base as (
+        select estado, age, monthly_income
+        from v_rotacion
+        where (p_genero is null or genero = p_genero)
+          and (p_contrato is null or tipocontrato = p_contrato)
+    ),
+    rangos as (
+        -- Rango vacío o de un solo valor: numpy lo abre en ±0.5
+        select
+            coalesce(case when min(age) = max(age) then min(age) - 0.5 else min(age) end, 0) as e_min,
+            coalesce(case when min(age) = max(age) then max(age) + 0.5 else max(age) end, 1) as e_max,
+            coalesce(case when min(monthly_income) = max(monthly_income) then min(monthly_income) - 0.5 else min(monthly_income) end, 0) as s_min,
+            coalesce(case when min(monthly_income) = max(monthly_income) then max(monthly_income) + 0.5 else max(monthly_income) end, 1) as s_max
+        from base
+    )
+    select
+        b.estado,
+        least(width_bucket(b.age, r.e_min, r.e_max, p_bins_edad), p_bins_edad) - 1 as bin_edad,
+        least(width_bucket(b.monthly_income, r.s_min, r.s_max, p_bins_salario), p_bins_salario) - 1 as bin_salario,
+        count(*) as cantidad,
+        r.e_min, r.e_max, r.s_min, r.s_max
+    from base b cross join rangos r
+    where b.age is not null and b.monthly_income is not null
+    group by 1, 2, 3, r.e_min, r.e_max, r.s_min, r.s_max
+    union all
+    -- Fila sin conteo para que los bordes lleguen aunque no haya puntos
+    select null, null, null, 0, e_min, e_max, s_min, s_max from rangos;
+$$;
+
+-- Colaboradores de una celda del mapa (detalle bajo demanda)
+create or replace function rotacion_celda(
+    p_genero text, p_contrato text,
+    p_edad_min numeric, p_edad_max numeric, p_salario_min numeric, p_salario_max numeric,
+    p_limite int default 1000
+)
+returns table ("Age" numeric, "MonthlyIncome" numeric, "Estado" text, "JobRole" text)
+language sql
+stable
+as $$
+    select age, monthly_income, estado, job_role
+    from v_rotacion
+    where (p_genero is null or genero = p_genero)
+      and (p_contrato is null or tipocontrato = p_contrato)
+      and age between p_edad_min and p_edad_max
+      and monthly_income between p_salario_min and p_salario_max
+    limit p_limite;
+$$;
+
+-- Solo usuarios autenticados: rotacion_celda devuelve edad, salario y cargo por colaborador.
+-- Las funciones nacen ejecutables por public; se revoca también lo otorgado antes a anon.
+revoke all on v_rotacion from public, anon;
+revoke execute on function rotacion_cubo(text, text) from public, anon;
+revoke execute on function rotacion_mapa_talento(text, text, int, int) from public, anon;
+revoke execute on function rotacion_celda(text, text, numeric, numeric, numeric, numeric, int) from public, anon;
+grant select on v_rotacion to authenticated;
+grant execute on function rotacion_cubo(text, text) to authenticated;
+grant execute on function rotacion_mapa_talento(text, text, int, int) to authenticated;
+grant execute on function rotacion_celda(text, text, numeric, numeric, numeric, numeric, int) to authenticated;
@@ -0,0 +1,25 @@
+-- =================================================================
+-- MARCA DE MODIFICACIÓN PARA LAS SONDAS DE VERSIÓN (versiones.py)
+-- Con updated_at la sonda de consolidado detecta ediciones además de
+-- altas y bajas; los índices mantienen la sonda en una lectura de índice.
+-- =================================================================
+
+alter table consolidado
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function marcar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists consolidado_updated_at on consolidado;
+create trigger consolidado_updated_at
+    before update on consolidado
+    for each row execute function marcar_updated_at();
+
+create index if not exists consolidado_updated_at_idx on consolidado (updated_at desc);
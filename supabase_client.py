@@ -0,0 +1,212 @@
+import streamlit as st
+import httpx
+import io
+import logging
+import random
+import time
+from supabase import create_client, Client, ClientOptions
+
+# =================================================================
+# ACCESO A DATOS COMPARTIDO (un solo cliente HTTP para todas las páginas)
+# =================================================================
+
+TIMEOUT_SEG = 30
+TIMEOUT_CONEXION_SEG = 10
+MAX_CONEXIONES = 20
+MAX_KEEPALIVE = 10
+KEEPALIVE_SEG = 60
+REINTENTOS = 3
+BACKOFF_BASE_SEG = 0.5
+TAMANO_PAGINA = 1000  # Igual o menor al max-rows de PostgREST
+TAMANO_BUFFER_CSV = 1 << 16
+
+logger = logging.getLogger(__name__)
+
+def _http2_disponible() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Cliente HTTP con keep-alive (y HTTP/2 si está `h2`) reutilizado por todo el proceso."""
+    timeout = float(st.secrets.get("SUPABASE_TIMEOUT_SEG", TIMEOUT_SEG))
+    transporte = httpx.HTTPTransport(
+        http2=_http2_disponible(),
+        limits=httpx.Limits(
+            max_connections=MAX_CONEXIONES,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_SEG
+        ),
+        retries=REINTENTOS  # Reintenta solo fallos de conexión
+    )
+    return httpx.Client(
+        transport=transporte,
+        timeout=httpx.Timeout(timeout, connect=TIMEOUT_CONEXION_SEG),
+        follow_redirects=True
+    )
+
+def _crear_cliente() -> Client:
+    url = st.secrets.get("SUPABASE_URL")
+    key = st.secrets.get("SUPABASE_KEY")
+    if not url or not key:
+        st.error("❌ Faltan credenciales de Supabase en secrets.toml")
+        st.stop()
+    try:
+        opciones = ClientOptions(httpx_client=get_http_client())
+    except TypeError:
+        # Versiones de supabase-py sin soporte para inyectar el cliente HTTP
+        opciones = ClientOptions(postgrest_client_timeout=TIMEOUT_SEG)
+    return create_client(url, key, opciones)
+
+# Datos y Auth van en clientes separados: al iniciar o renovar sesión supabase-py
+# reescribe el Authorization de su cliente, y ese JWT no debe filtrarse a las
+# lecturas compartidas entre sesiones (hilos SWR, precalentado, sondas, spool).
+@st.cache_resource
+def get_supabase() -> Client:
+    """Cliente de datos (PostgREST): nunca inicia sesión, siempre usa la clave del proyecto."""
+    return _crear_cliente()
+
+@st.cache_resource
+def get_supabase_auth() -> Client:
+    """Cliente solo para Supabase Auth (login, logout, renovación); comparte el pool HTTP."""
+    return _crear_cliente()
+
+def ejecutar(consulta, reintentos: int = REINTENTOS):
+    """Ejecuta una consulta de postgrest con reintentos y backoff exponencial ante fallos de red."""
+    for intento in range(reintentos + 1):
+        try:
+            return consulta.execute()
+        except httpx.TransportError:
+            if intento == reintentos:
+                raise
+            time.sleep(BACKOFF_BASE_SEG * (2 ** intento) * (1 + random.random()))
+
+def leer_paginas(tabla: str, columnas="*", clave: str = "id", desde=None, tamano_pagina: int = TAMANO_PAGINA):
+    """Recorre la tabla con paginación por cursor (keyset) sobre `clave`, desde `desde` exclusivo."""
+    select = columnas if isinstance(columnas, str) else ",".join(columnas)
+    ultimo = desde
+    while True:
+        consulta = get_supabase().table(tabla).select(select).order(clave).limit(tamano_pagina)
+        if ultimo is not None:
+            consulta = consulta.gt(clave, ultimo)
+        filas = ejecutar(consulta).data
+        if not filas:
+            break
+        yield filas
+        if len(filas) < tamano_pagina:
+            break
+        ultimo = valor_cursor(filas[-1][clave])
+
+def rpc(funcion: str, params: dict = None, token: str = None):
+    """Llama una función de Postgres; con `token` (JWT del usuario) corre con su rol y su RLS.
+
+    El token va solo en esta petición: el cliente de datos compartido no se modifica.
+    """
+    if token is None:
+        return ejecutar(get_supabase().rpc(funcion, params or {})).data
+    postgrest = get_supabase().postgrest
+    headers = httpx.Headers(postgrest.headers)
+    headers["Authorization"] = f"Bearer {token}"
+    for intento in range(REINTENTOS + 1):
+        try:
+            resp = postgrest.session.post(f"{postgrest.base_url}/rpc/{funcion}", json=params or {}, headers=headers)
+            resp.raise_for_status()
+            return resp.json()
+        except httpx.TransportError:
+            if intento == REINTENTOS:
+                raise
+            time.sleep(BACKOFF_BASE_SEG * (2 ** intento) * (1 + random.random()))
+
+def insertar(tabla: str, filas):
+    return ejecutar(get_supabase().table(tabla).insert(filas)).data
+
+def valor_cursor(valor):
+    """Valor de la clave listo para el filtro `gt.`: escalares numpy a Python y 1000.0 a 1000
+    (una columna entera rechaza `gt.1000.0` con 400)."""
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+# --- LECTURA MASIVA EN CSV (pandas se importa al usarla: el login no la necesita) ---
+def lectura_csv() -> bool:
+    return bool(st.secrets.get("SUPABASE_LECTURA_CSV", True))
+
+class _CuerpoHTTP(io.RawIOBase):
+    """Expone los trozos (ya descomprimidos) de una respuesta httpx como archivo de lectura."""
+
+    def __init__(self, trozos):
+        self._trozos = trozos
+        self._resto = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._resto:
+            self._resto = next(self._trozos, b"")
+            if not self._resto:
+                return 0
+        n = min(len(destino), len(self._resto))
+        destino[:n] = self._resto[:n]
+        self._resto = self._resto[n:]
+        return n
+
+def _pagina_csv(url: str, params: dict, headers: dict, dtype, reintentos: int = REINTENTOS):
+    """Descarga una página en text/csv con gzip y la parsea mientras llega, sin armar dicts por fila."""
+    import pandas as pd
+    for intento in range(reintentos + 1):
+        try:
+            with get_http_client().stream("GET", url, params=params, headers=headers) as resp:
+                resp.raise_for_status()
+                cuerpo = io.BufferedReader(_CuerpoHTTP(resp.iter_bytes()), TAMANO_BUFFER_CSV)
+                try:
+                    return pd.read_csv(cuerpo, dtype=dtype, engine="c")
+                except pd.errors.EmptyDataError:
+                    return pd.DataFrame()
+        except httpx.TransportError:
+            if intento == reintentos:
+                raise
+            time.sleep(BACKOFF_BASE_SEG * (2 ** intento) * (1 + random.random()))
+
+def leer_csv(tabla: str, columnas="*", clave: str = "id", desde=None, dtype=None, tamano_pagina: int = TAMANO_PAGINA):
+    """Como leer_paginas, pero cada página llega como DataFrame parseado desde CSV comprimido."""
+    postgrest = get_supabase().postgrest
+    url = f"{postgrest.base_url}/{tabla}"
+    # Mismos encabezados de autenticación que el cliente postgrest; Headers reemplaza
+    # Accept sin importar mayúsculas (un dict enviaría también el application/json original)
+    headers = httpx.Headers(postgrest.headers)
+    headers.update({"Accept": "text/csv", "Accept-Encoding": "gzip"})
+    select = columnas if isinstance(columnas, str) else ",".join(columnas)
+    ultimo = desde
+    while True:
+        params = {"select": select, "order": f"{clave}.asc", "limit": str(tamano_pagina)}
+        if ultimo is not None:
+            params[clave] = f"gt.{ultimo}"
+        bloque = _pagina_csv(url, params, headers, dtype)
+        if bloque.empty:
+            break
+        yield bloque
+        if len(bloque) < tamano_pagina:
+            break
+        ultimo = valor_cursor(bloque[clave].iloc[-1])
+
+def leer_paginas_df(tabla: str, columnas="*", clave: str = "id", desde=None, dtype=None, tamano_pagina: int = TAMANO_PAGINA):
+    """Páginas como DataFrames: CSV si está habilitado y, ante un error, sigue en JSON desde la última clave."""
+    import pandas as pd
+    ultimo = desde
+    if lectura_csv():
+        try:
+            for bloque in leer_csv(tabla, columnas, clave, ultimo, dtype, tamano_pagina):
+                yield bloque
+                ultimo = valor_cursor(bloque[clave].iloc[-1])
+            return
+        except (httpx.HTTPStatusError, ValueError) as e:
+            logger.warning("Lectura CSV de %s no disponible (%s); se continúa con JSON", tabla, e)
+    nombres = None if isinstance(columnas, str) else list(columnas)
+    for filas in leer_paginas(tabla, columnas, clave, ultimo, tamano_pagina):
+        yield pd.DataFrame.from_records(filas, columns=nombres)
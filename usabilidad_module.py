@@ -1,14 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-from textblob import TextBlob
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from fpdf import FPDF
 import datetime
-import tempfile
+import io
 import os
+import re
+import threading
+import time
+from collections import Counter
+from supabase_client import leer_paginas_df
+from sentimiento import analizar_lote
+import cache_render
+import cache_swr
+import versiones
+from instrumentacion import instrumentar, mostrar_grafico, medir
+
+# plotly, matplotlib, wordcloud y fpdf se importan dentro de las funciones que
+# los usan: solo se cargan al dibujar la página o generar un reporte.
 
 # --- FUNCIONES DE APOYO ---
 def limpiar_texto_pdf(texto):
@@ -16,42 +24,285 @@ def limpiar_texto_pdf(texto):
     # Reemplaza caracteres no compatibles con latin-1
     return texto.encode('latin-1', 'replace').decode('latin-1')
 
+ITEMS_SUS = [f'p{i}' for i in range(1, 11)]
+
+# Ítems impares aportan (r - 1) y pares (5 - r): contribución = r * signo + desplazamiento
+_SIGNO_SUS = np.array([1, -1] * 5, dtype=np.int8)
+_DESPLAZAMIENTO_SUS = np.array([-1, 5] * 5, dtype=np.int8)
+TAMANO_BLOQUE_SUS = 1_000_000
+
+def calcular_sus_array(respuestas):
+    """Puntajes SUS y contribuciones por ítem para una matriz (n, 10) de respuestas 1-5."""
+    r = np.asarray(respuestas)
+    if r.dtype.kind == 'f':
+        # Con respuestas faltantes (NaN) el puntaje queda en NaN
+        contribuciones = r * _SIGNO_SUS + _DESPLAZAMIENTO_SUS
+        return contribuciones.sum(axis=1) * 2.5, contribuciones
+    contribuciones = np.ascontiguousarray(r, dtype=np.int8) * _SIGNO_SUS + _DESPLAZAMIENTO_SUS
+    return contribuciones.sum(axis=1, dtype=np.int16) * 2.5, contribuciones
+
+def calcular_sus_por_bloques(respuestas, tamano_bloque=TAMANO_BLOQUE_SUS):
+    """Puntajes SUS para históricos grandes: procesa por bloques sin guardar contribuciones.
+
+    Acepta una matriz (n, 10) o un iterable de matrices (p. ej. lotes leídos de disco).
+    """
+    if isinstance(respuestas, np.ndarray):
+        puntajes = np.empty(len(respuestas), dtype=np.float64)
+        for inicio in range(0, len(respuestas), tamano_bloque):
+            fin = inicio + tamano_bloque
+            puntajes[inicio:fin] = calcular_sus_array(respuestas[inicio:fin])[0]
+        return puntajes
+    return np.concatenate([calcular_sus_array(bloque)[0] for bloque in respuestas] or [np.empty(0)])
+
+@instrumentar("calcular_sus")
 def calcular_sus(df):
-    df_sus = df.copy()
-    for i in range(1, 11):
-        col = f'p{i}'
-        if i % 2 != 0:
-            df_sus[col] = df_sus[col] - 1
-        else:
-            df_sus[col] = 5 - df_sus[col]
-    return df_sus[[f'p{i}' for i in range(1, 11)]].sum(axis=1) * 2.5
+    puntajes, _ = calcular_sus_array(df[ITEMS_SUS].to_numpy())
+    return pd.Series(puntajes, index=df.index)
 
+@instrumentar("analizar_sentimiento_ia", filas=None)
 def analizar_sentimiento_ia(texto):
-    if not texto or texto.lower() in ["sin comentario", "nan", ""]:
-        return "Neutral"
-    blob = TextBlob(texto)
-    score = blob.sentiment.polarity
-    pos = ['excelente', 'bueno', 'facil', 'util', 'satisfecho', 'bien']
-    neg = ['lento', 'error', 'complejo', 'dificil', 'malo', 'engorroso']
-    if any(p in texto.lower() for p in pos): score += 0.2
-    if any(p in texto.lower() for p in neg): score -= 0.2
-    return "Positivo" if score > 0.1 else "Negativo" if score < -0.1 else "Neutral"
-
-def obtener_oportunidades(df, promedio_sus):
+    return analizar_lote([texto])[0][0]
+
+@instrumentar("etiquetas_sentimiento")
+def etiquetas_sentimiento(textos):
+    """Sentimiento de una serie de comentarios en un solo lote (con caché persistente)."""
+    return [etiqueta for etiqueta, _ in analizar_lote(list(textos))]
+
+# Tema -> fragmentos que lo delatan en un comentario (se cuentan por cubeta al sincronizar)
+TEMAS_COMENTARIOS = {
+    "navegacion": ["filtro", "ubicar", "buscar"],
+    "explicabilidad": ["explic", "grafic", "entender"],
+}
+_PATRON_TEMAS = {tema: "|".join(map(re.escape, partes)) for tema, partes in TEMAS_COMENTARIOS.items()}
+_PATRON_PALABRA = re.compile(r"\w[\w']+")
+
+def obtener_oportunidades(promedio_sus, menciones):
+    """Radar de mejoras a partir del SUS y de cuántos comentarios tocan cada tema."""
     ops = []
-    textos = " ".join(df['observacion'].astype(str)).lower()
     if promedio_sus < 75:
         ops.append({"prioridad": "Alta", "color": (198, 40, 40), "msg": "Revisión de flujos críticos: El puntaje SUS sugiere fricción en la experiencia."})
-    if any(p in textos for p in ["filtro", "ubicar", "buscar"]):
+    if menciones.get("navegacion"):
         ops.append({"prioridad": "Media", "color": (239, 108, 0), "msg": "Optimización de Navegación: Los usuarios sugieren mejorar la ubicación de filtros."})
-    if any(p in textos for p in ["explic", "grafic", "entender"]):
+    if menciones.get("explicabilidad"):
         ops.append({"prioridad": "Media", "color": (239, 108, 0), "msg": "Explicabilidad Visual: Se recomienda añadir descripciones a los gráficos complejos."})
     if not ops:
         ops.append({"prioridad": "Baja", "color": (21, 101, 192), "msg": "Mantenimiento: Continuar con el monitoreo de satisfacción actual."})
     return ops
 
+# --- DATOS EN VIVO CON AGREGADOS INCREMENTALES ---
+TABLA_USABILIDAD = "encuestas_usabilidad"
+COLUMNA_FECHA = "created_at"
+VALORES_LIKERT = range(1, 6)
+SENTIMIENTOS = ["Positivo", "Neutral", "Negativo"]
+LLAVES_AGREGADO = ["fecha", "id_encuesta"]
+BINS_SUS = 10  # Cubetas de 10 puntos: [0,10), ..., [90,100]
+INTERVALO_SYNC_SEG = 60  # Solo si la sonda de versiones.py no responde
+
+@st.cache_resource
+def _snapshot_usabilidad():
+    """Estado compartido entre sesiones: bloques de filas puntuadas, agregados y palabras por cubeta y marca de agua.
+
+    `leidas` cuenta las filas remotas recibidas (incluye las descartadas al puntuar) para
+    compararlo con el conteo remoto hasta la marca de agua.
+    """
+    return {"datos": _DATOS_VACIOS, "max_id": None, "leidas": 0, "ultima_sync": 0.0, "lock": threading.Lock()}
+
+# (bloques de filas puntuadas, agregados por cubeta, frecuencias de palabras por cubeta)
+_DATOS_VACIOS = ((), pd.DataFrame(), {})
+MAX_BLOQUES = 32  # Al superarlo los bloques se compactan en uno (copia amortizada)
+
+def _preparar_filas(df):
+    """Puntúa solo las filas nuevas: SUS, sentimiento y fecha local de la respuesta."""
+    df[ITEMS_SUS] = df[ITEMS_SUS].apply(pd.to_numeric, errors='coerce')
+    df = df.dropna(subset=ITEMS_SUS).copy()
+    if COLUMNA_FECHA in df.columns:
+        fechas = pd.to_datetime(df[COLUMNA_FECHA], utc=True, errors='coerce', format='ISO8601')
+    else:
+        fechas = pd.Series(pd.Timestamp.now(tz="UTC"), index=df.index)
+    df['fecha'] = fechas.dt.tz_convert("America/Lima").dt.normalize().dt.tz_localize(None)
+    df['id_encuesta'] = df['id_encuesta'].fillna("SIN_ENCUESTA")
+    df['observacion'] = df['observacion'].fillna("Sin comentario").astype(str)
+    df['sus_score'] = calcular_sus(df)
+    df['sentimiento'] = etiquetas_sentimiento(df['observacion'])
+    return df[["id"] + LLAVES_AGREGADO + ITEMS_SUS + ['observacion', 'sus_score', 'sentimiento']]
+
+def agregar_filas(df):
+    """Resume filas en cubetas (fecha, id_encuesta) con sumas aditivas."""
+    partes = {col: df[col].to_numpy() for col in LLAVES_AGREGADO}
+    sus = df['sus_score'].to_numpy(dtype='float64')
+    partes["n"] = np.ones(len(df), dtype=np.int64)
+    partes["sus_suma"] = sus
+    partes["sus_suma_cuad"] = sus ** 2
+    cubeta = np.minimum((sus // (100 / BINS_SUS)).astype(np.int64), BINS_SUS - 1)
+    for b in range(BINS_SUS):
+        partes[f"sus_bin_{b}"] = (cubeta == b).astype(np.int64)
+    for item in ITEMS_SUS:
+        valores = df[item].to_numpy()
+        for v in VALORES_LIKERT:
+            partes[f"{item}_{v}"] = (valores == v).astype(np.int64)
+    sentimiento = df['sentimiento'].to_numpy()
+    for s in SENTIMIENTOS:
+        partes[f"sent_{s}"] = (sentimiento == s).astype(np.int64)
+    observaciones = df['observacion'].str.lower()
+    for tema, patron in _PATRON_TEMAS.items():
+        partes[f"tema_{tema}"] = observaciones.str.contains(patron).to_numpy(dtype=np.int64)
+    return pd.DataFrame(partes).groupby(LLAVES_AGREGADO, as_index=False).sum()
+
+def frecuencias_palabras(observaciones) -> Counter:
+    """Palabras de los comentarios (sin los "Sin comentario") para la nube."""
+    frecuencias = Counter()
+    for texto in observaciones:
+        texto = texto.lower()
+        if texto != "sin comentario":
+            frecuencias.update(p for p in _PATRON_PALABRA.findall(texto) if not p.isdigit())
+    return frecuencias
+
+def palabras_por_cubeta(df) -> dict:
+    return {llave: frecuencias_palabras(grupo['observacion'])
+            for llave, grupo in df.groupby(LLAVES_AGREGADO, sort=False)}
+
+def _acumular_palabras(palabras, nuevas):
+    """Dict nuevo (los lectores pueden estar recorriendo el anterior); solo se suman las cubetas tocadas."""
+    acumuladas = dict(palabras)
+    for llave, frecuencias in nuevas.items():
+        acumuladas[llave] = acumuladas[llave] + frecuencias if llave in acumuladas else frecuencias
+    return acumuladas
+
+def filas_puntuadas(bloques):
+    """Une los bloques de filas puntuadas (solo al necesitar las filas, p. ej. reportes por cohorte)."""
+    return bloques[0] if len(bloques) == 1 else pd.concat(bloques, ignore_index=True)
+
+def _acumular(agregados, nuevos):
+    if agregados.empty:
+        return nuevos
+    return pd.concat([agregados, nuevos], ignore_index=True).groupby(LLAVES_AGREGADO, as_index=False).sum()
+
+def _sincronizar_usabilidad(snap):
+    columnas = ["id", COLUMNA_FECHA, "id_encuesta", "observacion"] + ITEMS_SUS
+    paginas = list(leer_paginas_df(TABLA_USABILIDAD, columnas, "id", desde=snap["max_id"]))
+    if paginas:
+        crudas = pd.concat(paginas, ignore_index=True)
+        snap["leidas"] += len(crudas)
+        nuevos = _preparar_filas(crudas)
+        if not nuevos.empty:
+            bloques, agregados, palabras = snap["datos"]
+            bloques = bloques + (nuevos,)
+            if len(bloques) > MAX_BLOQUES:
+                bloques = (filas_puntuadas(bloques),)
+            snap["datos"] = (
+                bloques,
+                _acumular(agregados, agregar_filas(nuevos)),
+                _acumular_palabras(palabras, palabras_por_cubeta(nuevos)),
+            )
+        # La marca de agua sale de lo leído, incluidas las filas descartadas al puntuar,
+        # para no volver a pedirlas en cada sincronización
+        maximo = int(crudas["id"].max())
+        snap["max_id"] = maximo if snap["max_id"] is None else max(snap["max_id"], maximo)
+    snap["ultima_sync"] = time.time()
+
+def _actualizar_usabilidad(sonda=None):
+    snap = _snapshot_usabilidad()
+    with snap["lock"]:
+        _sincronizar_usabilidad(snap)
+        # El conteo de la sonda es de antes de sincronizar: se compara contra uno fresco hasta la marca de agua
+        if sonda is not None and snap["max_id"] is not None:
+            remotas = versiones.conteo_hasta(TABLA_USABILIDAD, snap["max_id"])
+            if remotas is not None and remotas != snap["leidas"]:
+                # Respuestas borradas: los agregados aditivos ya no sirven
+                snap.update(datos=_DATOS_VACIOS, max_id=None, leidas=0)
+                _sincronizar_usabilidad(snap)
+    return snap["datos"]
+
+def get_usabilidad_data():
+    """Devuelve (bloques de filas puntuadas, agregados y palabras por cubeta); al cambiar la tabla pide solo las respuestas nuevas en segundo plano."""
+    sonda = versiones.sondear(TABLA_USABILIDAD)
+    try:
+        return cache_swr.obtener("usabilidad", lambda: _actualizar_usabilidad(sonda), INTERVALO_SYNC_SEG,
+                                 sonda and sonda["token"])
+    except Exception as e:
+        st.error(f"❌ Error al consultar encuestas de usabilidad: {e}")
+        return _snapshot_usabilidad()["datos"]
+
+def filtrar_agregados(agregados, desde, hasta, encuestas):
+    mask = (agregados['fecha'] >= pd.Timestamp(desde)) & (agregados['fecha'] <= pd.Timestamp(hasta))
+    if encuestas:
+        mask &= agregados['id_encuesta'].isin(encuestas)
+    return agregados[mask]
+
+def filtrar_palabras(palabras, desde, hasta, encuestas) -> Counter:
+    """Suma las frecuencias de las cubetas dentro de los filtros (sin recorrer comentarios)."""
+    desde, hasta = pd.Timestamp(desde), pd.Timestamp(hasta)
+    total = Counter()
+    for (fecha, encuesta), frecuencias in palabras.items():
+        if desde <= fecha <= hasta and (not encuestas or encuesta in encuestas):
+            total.update(frecuencias)
+    return total
+
+def resumir_agregados(agregados):
+    """KPIs a partir de las sumas: media y desviación SUS, histogramas y sentimientos."""
+    tot = agregados.drop(columns=LLAVES_AGREGADO).sum()
+    n = int(tot.get("n", 0))
+    promedio = tot["sus_suma"] / n if n else 0.0
+    varianza = tot["sus_suma_cuad"] / n - promedio ** 2 if n else 0.0
+    sentimientos = {s: int(tot.get(f"sent_{s}", 0)) for s in SENTIMIENTOS}
+    return {
+        "n": n,
+        "promedio": promedio,
+        "desviacion": float(np.sqrt(max(varianza, 0.0))),
+        "hist_sus": [int(tot.get(f"sus_bin_{b}", 0)) for b in range(BINS_SUS)],
+        "items": pd.DataFrame(
+            [[int(tot.get(f"{item}_{v}", 0)) for v in VALORES_LIKERT] for item in ITEMS_SUS],
+            index=ITEMS_SUS, columns=list(VALORES_LIKERT)
+        ),
+        "sentimientos": sentimientos,
+        "menciones": {tema: int(tot.get(f"tema_{tema}", 0)) for tema in TEMAS_COMENTARIOS},
+        # Empates: el primero en orden alfabético, como Series.mode()
+        "sentimiento_dominante": max(sorted(sentimientos), key=lambda s: sentimientos[s]),
+    }
+
+# --- IMÁGENES CACHEADAS POR CONTENIDO (interfaz y PDF) ---
+def _figura_a_png(fig):
+    import matplotlib.pyplot as plt
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
+
+def png_nube_palabras(frecuencias):
+    """Nube de palabras (figura 15x5) reutilizada entre reruns y sesiones."""
+    def generar():
+        import matplotlib.pyplot as plt
+        from wordcloud import WordCloud
+        fig_wc, ax = plt.subplots(figsize=(15, 5))
+        if frecuencias:
+            wc = WordCloud(width=1000, height=300, background_color="white", colormap='Blues').generate_from_frequencies(frecuencias)
+            ax.imshow(wc, interpolation='bilinear'); ax.axis("off")
+        return _figura_a_png(fig_wc)
+    return cache_render.obtener_o_generar("nube", cache_render.huella(frecuencias), generar)
+
+def png_histograma_sus(df_hist):
+    def generar():
+        import matplotlib.pyplot as plt
+        fig_h, ax_h = plt.subplots(figsize=(5,4))
+        ax_h.bar(df_hist['sus_score'], df_hist['Cantidad'], width=100 / BINS_SUS, color='#1E3C72', edgecolor='white')
+        ax_h.set_title("Distribucion SUS", fontsize=10)
+        return _figura_a_png(fig_h)
+    return cache_render.obtener_o_generar("hist_sus", cache_render.huella(df_hist), generar)
+
+def png_torta_sentimiento(counts):
+    def generar():
+        import matplotlib.pyplot as plt
+        fig_p, ax_p = plt.subplots(figsize=(5,4))
+        ax_p.pie(counts, labels=counts.index, autopct='%1.1f%%', colors=["#2e7d32", "#ffa000", "#d32f2f"])
+        ax_p.set_title("Clima de Opinion", fontsize=10)
+        return _figura_a_png(fig_p)
+    return cache_render.obtener_o_generar("torta", cache_render.huella(counts), generar)
+
 # --- GENERADOR DE PDF FIEL A LA INTERFAZ ---
-def generar_pdf_reporte(score_promedio, total, sentimiento_dominante, path_hist, path_pie, path_wc, oportunidades, analisis):
+@instrumentar("generar_pdf_reporte", filas=None, tamano=len)
+def generar_pdf_reporte(score_promedio, total, sentimiento_dominante, png_hist, png_pie, png_wc, oportunidades, analisis, cohorte=None):
+    """Arma el PDF en memoria; las imágenes llegan como bytes PNG (sin archivos temporales)."""
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     
@@ -62,6 +313,8 @@ def generar_pdf_reporte(score_promedio, total, sentimiento_dominante, path_hist,
     pdf.set_font("Helvetica", '', 10)
     pdf.set_text_color(100, 100, 100)
     pdf.cell(0, 5, f"Generado el: {datetime.date.today()}", ln=True, align='C')
+    if cohorte:
+        pdf.cell(0, 5, limpiar_texto_pdf(f"Cohorte: {cohorte}"), ln=True, align='C')
     pdf.ln(10)
     
     # SECCIÓN 1: TABLA DE KPIs (IGUAL A LA INTERFAZ)
@@ -90,14 +343,14 @@ def generar_pdf_reporte(score_promedio, total, sentimiento_dominante, path_hist,
     pdf.cell(95, 10, "Distribucion SUS", 0, 0, 'L')
     pdf.cell(95, 10, "Clima de Opinion", 0, 1, 'L')
     
-    pdf.image(path_hist, x=10, y=pdf.get_y(), w=90)
-    pdf.image(path_pie, x=105, y=pdf.get_y(), w=90)
+    pdf.image(io.BytesIO(png_hist), x=10, y=pdf.get_y(), w=90)
+    pdf.image(io.BytesIO(png_pie), x=105, y=pdf.get_y(), w=90)
     pdf.ln(75)
     
     # SECCIÓN 3: NUBE DE PALABRAS
     pdf.set_font("Helvetica", 'B', 12)
     pdf.cell(0, 10, "Temas Relevantes (NLP)", ln=True)
-    pdf.image(path_wc, x=15, w=180)
+    pdf.image(io.BytesIO(png_wc), x=15, w=180)
     pdf.ln(65)
     
     # SECCIÓN 4: ANÁLISIS ESTRATÉGICO
@@ -128,10 +381,41 @@ def generar_pdf_reporte(score_promedio, total, sentimiento_dominante, path_hist,
         pdf.cell(0, 8, f"  {limpiar_texto_pdf(op['msg'])}", 0, 1)
         pdf.ln(2)
         
-    return pdf.output(dest='S').encode('latin-1', errors='replace')
+    # fpdf2 (no PyFPDF: image() con BytesIO solo existe en fpdf2) devuelve un bytearray
+    return bytes(pdf.output())
+
+def texto_analisis(promedio_sus, sent_predom):
+    return f"El puntaje de {promedio_sus:.1f} indica que el sistema es altamente usable. El sentimiento predominante {sent_predom} valida la adopción positiva de la IA por parte de los usuarios, aunque existen áreas de oportunidad en la navegación."
+
+def tablas_reporte(resumen):
+    """Histograma SUS y conteo de sentimientos (no vacíos) listos para graficar."""
+    bordes_sus = np.linspace(0, 100, BINS_SUS + 1)
+    df_hist = pd.DataFrame({"sus_score": bordes_sus[:-1] + 100 / BINS_SUS / 2, "Cantidad": resumen["hist_sus"]})
+    counts = pd.Series(resumen["sentimientos"])
+    return df_hist, counts[counts > 0].sort_values(ascending=False)
+
+def pdf_cohorte(df, cohorte=None):
+    """Reporte completo para un subconjunto de filas puntuadas (p. ej. una cohorte en segundo plano)."""
+    resumen = resumir_agregados(agregar_filas(df))
+    df_hist, counts = tablas_reporte(resumen)
+    promedio, sent = resumen["promedio"], resumen["sentimiento_dominante"]
+    return generar_pdf_reporte(promedio, resumen["n"], sent,
+                               png_histograma_sus(df_hist), png_torta_sentimiento(counts),
+                               png_nube_palabras(frecuencias_palabras(df['observacion'])),
+                               obtener_oportunidades(promedio, resumen["menciones"]), texto_analisis(promedio, sent), cohorte)
+
+def pdf_reporte(clave, score_promedio, total, sentimiento_dominante, df_hist, counts, frecuencias, oportunidades, analisis):
+    """PDF cacheado solo en memoria (LRU) por la huella de los datos mostrados y la fecha
+    impresa en el reporte; las imágenes sí pueden reutilizarse desde disco."""
+    def generar():
+        return generar_pdf_reporte(score_promedio, total, sentimiento_dominante,
+                                   png_histograma_sus(df_hist), png_torta_sentimiento(counts),
+                                   png_nube_palabras(frecuencias), oportunidades, analisis)
+    return cache_render.obtener_o_generar("pdf", clave, generar, disco=False)
 
 # --- INTERFAZ ---
 def render_modulo_usabilidad():
+    import plotly.express as px
     st.markdown("""
         <style>
         .metric-card { background-color: #ffffff; padding: 20px; border-radius: 10px; box-shadow: 2px 2px 10px rgba(0,0,0,0.1); text-align: center; }
@@ -147,35 +431,30 @@ def render_modulo_usabilidad():
     st.markdown("<p style='text-align: center; color: gray;'>Evaluación de experiencia de usuario asistida por NLP</p>", unsafe_allow_html=True)
     st.markdown("---")
 
-    # Datos
-    data = {
-        'p1': [4,5,5,5,4,5,3,4,4,5,4,4,5,3,2,3,3,5,5,5,4],
-        'p2': [2,3,1,1,1,3,3,1,4,1,3,1,2,2,1,2,1,1,1,1,3],
-        'p3': [4,3,4,5,4,4,4,4,3,5,4,4,5,5,4,5,4,5,5,5,4],
-        'p4': [2,2,3,1,2,1,2,1,1,1,3,2,2,1,1,1,1,1,1,1,2],
-        'p5': [4,3,3,5,4,4,3,3,3,5,5,4,5,5,4,5,4,5,4,5,5],
-        'p6': [2,2,2,1,1,1,2,2,2,1,3,2,2,1,2,1,1,2,1,1,1],
-        'p7': [5,4,4,5,4,5,4,3,4,5,5,5,3,5,3,5,5,5,3,4,5],
-        'p8': [2,3,4,1,1,1,2,1,1,1,1,1,1,1,2,1,1,3,1,1,1],
-        'p9': [4,4,3,5,4,5,4,4,3,5,5,5,5,5,5,5,5,4,3,5,3],
-        'p10': [3,2,2,1,4,1,2,1,1,1,1,1,1,1,1,1,1,2,1,3,2],
-        'observacion': [
-            "Sin comentario", "Mejorar graficos", "Me costo ubicar filtros", 
-            "Excelente sistema", "Agregar ayuda visual", "Facil de entender", 
-            "Parece complejo al inicio", "Simplificar", "Agregar descripciones",
-            "Cumple su funcion", "Mejorar navegacion", "Buena experiencia",
-            "Necesita retroalimentacion", "Herramienta util", "Mejorar explicabilidad",
-            "Diseño agradable", "Informacion relevante", "Mejorar usabilidad",
-            "Estoy satisfecho", "Graficos didacticos", "Todo bien"
-        ]
-    }
-    df = pd.DataFrame(data)
-    df['sus_score'] = calcular_sus(df)
-    df['sentimiento'] = df['observacion'].apply(analizar_sentimiento_ia)
-    promedio_sus = df['sus_score'].mean()
-    sent_predom = df['sentimiento'].mode()[0]
-    oportunidades = obtener_oportunidades(df, promedio_sus)
-    analisis_texto = f"El puntaje de {promedio_sus:.1f} indica que el sistema es altamente usable. El sentimiento predominante {sent_predom} valida la adopción positiva de la IA por parte de los usuarios, aunque existen áreas de oportunidad en la navegación."
+    # Datos en vivo (solo se puntúan las respuestas nuevas en cada sincronización)
+    bloques, agregados, palabras = get_usabilidad_data()
+    if agregados.empty:
+        st.info("Aún no hay evaluaciones registradas en encuestas_usabilidad.")
+        return
+
+    f1, f2 = st.columns(2)
+    with f1:
+        fecha_min, fecha_max = agregados['fecha'].min().date(), agregados['fecha'].max().date()
+        rango = st.date_input("📅 Rango de fechas", (fecha_min, fecha_max), min_value=fecha_min, max_value=fecha_max)
+        desde, hasta = (rango if isinstance(rango, (tuple, list)) and len(rango) == 2 else (fecha_min, fecha_max))
+    with f2:
+        encuestas_sel = st.multiselect("🗂️ Encuesta", sorted(agregados['id_encuesta'].unique().tolist()))
+
+    resumen = resumir_agregados(filtrar_agregados(agregados, desde, hasta, encuestas_sel))
+    if resumen["n"] == 0:
+        st.warning("No hay evaluaciones para los filtros seleccionados.")
+        return
+
+    promedio_sus = resumen["promedio"]
+    sent_predom = resumen["sentimiento_dominante"]
+    oportunidades = obtener_oportunidades(promedio_sus, resumen["menciones"])
+    analisis_texto = texto_analisis(promedio_sus, sent_predom)
+    df_hist, counts = tablas_reporte(resumen)
 
     # --- KPIs ---
     c1, c2, c3 = st.columns(3)
@@ -183,7 +462,8 @@ def render_modulo_usabilidad():
     with c2:
         color_kpi = "#2e7d32" if sent_predom == "Positivo" else "#ffa000"
         st.markdown(f'<div class="metric-card"><p style="color:gray;">Sentimiento IA</p><h1 style="color:{color_kpi};">{sent_predom}</h1></div>', unsafe_allow_html=True)
-    with c3: st.markdown(f'<div class="metric-card"><p style="color:gray;">Usuarios</p><h1 style="color:#1976D2;">{len(df)}</h1></div>', unsafe_allow_html=True)
+    with c3: st.markdown(f'<div class="metric-card"><p style="color:gray;">Usuarios</p><h1 style="color:#1976D2;">{resumen["n"]}</h1></div>', unsafe_allow_html=True)
+    st.caption(f"Desviación estándar SUS: {resumen['desviacion']:.1f}")
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -191,25 +471,33 @@ def render_modulo_usabilidad():
     g1, g2 = st.columns(2)
     with g1:
         st.subheader("📊 Distribución SUS")
-        fig = px.histogram(df, x="sus_score", nbins=10, color_discrete_sequence=['#1E3C72'], template="simple_white")
+        fig = px.bar(df_hist, x="sus_score", y="Cantidad", color_discrete_sequence=['#1E3C72'], template="simple_white")
+        fig.update_traces(width=100 / BINS_SUS * 0.95)
         fig.update_layout(margin=dict(l=20, r=20, t=20, b=20), height=300)
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_grafico("Distribución SUS", fig, use_container_width=True)
     with g2:
         st.subheader("😊 Clima de Opinión")
-        fig2 = px.pie(df, names='sentimiento', color='sentimiento', 
+        fig2 = px.pie(names=counts.index, values=counts.values, color=counts.index, 
                       color_discrete_map={"Positivo":"#2e7d32", "Neutral":"#ffa000", "Negativo":"#d32f2f"}, hole=0.4)
         fig2.update_layout(margin=dict(l=20, r=20, t=20, b=20), height=300)
-        st.plotly_chart(fig2, use_container_width=True)
+        mostrar_grafico("Clima de opinión", fig2, use_container_width=True)
+
+    with st.expander("📋 Distribución de respuestas por pregunta"):
+        items = resumen["items"].reset_index().melt(id_vars="index", var_name="Respuesta", value_name="Cantidad")
+        fig_items = px.bar(items, x="index", y="Cantidad", color="Respuesta", barmode="stack",
+                           labels={"index": "Pregunta"}, template="simple_white")
+        fig_items.update_layout(margin=dict(l=20, r=20, t=20, b=20), height=300)
+        mostrar_grafico("Respuestas por pregunta", fig_items, use_container_width=True)
 
     # --- NUBE DE PALABRAS ---
     st.markdown("---")
     st.subheader("☁️ Temas Relevantes (NLP)")
-    textos = " ".join([c for c in df['observacion'] if c.lower() != "sin comentario"])
-    fig_wc, ax = plt.subplots(figsize=(15, 5))
-    if len(textos) > 5:
-        wc = WordCloud(width=1000, height=300, background_color="white", colormap='Blues').generate(textos)
-        ax.imshow(wc, interpolation='bilinear'); ax.axis("off")
-        st.pyplot(fig_wc)
+    frecuencias = filtrar_palabras(palabras, desde, hasta, encuestas_sel)
+    with medir("gráfico: Nube de palabras") as datos:
+        png_wc = png_nube_palabras(frecuencias)
+        datos["bytes_figura"] = len(png_wc)
+        if frecuencias:
+            st.image(png_wc, use_container_width=True)
 
     # --- ANÁLISIS ESTRATÉGICO Y RADAR ---
     st.markdown("---")
@@ -220,26 +508,46 @@ def render_modulo_usabilidad():
     for op in oportunidades:
         st.markdown(f'<div class="op-card op-{op["prioridad"]}"><b>{op["prioridad"]}:</b> {op["msg"]}</div>', unsafe_allow_html=True)
 
-    # --- GENERACIÓN IMÁGENES PARA PDF (Matplotlib para mantener títulos y porcentajes) ---
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_h:
-        fig_h, ax_h = plt.subplots(figsize=(5,4))
-        ax_h.hist(df['sus_score'], color='#1E3C72', edgecolor='white')
-        ax_h.set_title("Distribucion SUS", fontsize=10)
-        fig_h.savefig(tmp_h.name); path_hist = tmp_h.name; plt.close(fig_h)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_p:
-        fig_p, ax_p = plt.subplots(figsize=(5,4))
-        counts = df['sentimiento'].value_counts()
-        ax_p.pie(counts, labels=counts.index, autopct='%1.1f%%', colors=["#2e7d32", "#ffa000", "#d32f2f"])
-        ax_p.set_title("Clima de Opinion", fontsize=10)
-        fig_p.savefig(tmp_p.name); path_pie = tmp_p.name; plt.close(fig_p)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_w:
-        fig_wc.savefig(tmp_w.name); path_wc = tmp_w.name; plt.close(fig_wc)
-
+    # --- REPORTE PDF (solo bajo demanda) ---
+    # La fecha entra en la clave: el reporte imprime "Generado el"
+    clave_pdf = cache_render.huella(promedio_sus, resumen["n"], sent_predom, df_hist, counts, frecuencias, oportunidades,
+                                    analisis_texto, datetime.date.today())
     with st.sidebar:
-        pdf_bytes = generar_pdf_reporte(promedio_sus, len(df), sent_predom, path_hist, path_pie, path_wc, oportunidades, analisis_texto)
-        st.download_button("📥 Descargar Reporte PDF", data=pdf_bytes, file_name="Reporte_Final_SUS.pdf", mime="application/pdf", use_container_width=True)
+        if st.button("📄 Preparar reporte PDF", use_container_width=True):
+            with st.spinner("Generando reporte..."):
+                st.session_state["pdf_usabilidad"] = (clave_pdf, pdf_reporte(
+                    clave_pdf, promedio_sus, resumen["n"], sent_predom, df_hist, counts, frecuencias, oportunidades, analisis_texto))
+        preparado = st.session_state.get("pdf_usabilidad")
+        if preparado and preparado[0] == clave_pdf:
+            st.download_button("📥 Descargar Reporte PDF", data=preparado[1], file_name="Reporte_Final_SUS.pdf", mime="application/pdf", use_container_width=True)
+        render_panel_reportes(bloques)
+        stats = cache_render.estadisticas()
+        st.caption(f"🖼️ Caché de imágenes: {stats['aciertos_memoria'] + stats['aciertos_disco']} aciertos / {stats['fallos']} fallos")
+
+# --- EXPORTACIÓN MASIVA POR COHORTES (procesos en segundo plano) ---
+def render_panel_reportes(bloques):
+    import reportes_jobs
+    with st.expander("🗃️ Reportes por cohorte"):
+        dimension = st.selectbox("Agrupar por", reportes_jobs.dimensiones_disponibles(bloques[0]), key="cohorte_dim")
+        if st.button("🚀 Generar reportes", use_container_width=True):
+            trabajo = reportes_jobs.encolar_trabajo(filas_puntuadas(bloques), dimension)
+            st.toast(f"Trabajo {trabajo} en cola")
+        for t in reportes_jobs.trabajos_recientes():
+            avance = t["completados"] / t["total"] if t["total"] else 0.0
+            st.progress(avance, text=f"{t['descripcion']} · {t['estado']} ({t['completados']}/{t['total']})")
+            if t["errores"]:
+                st.caption(f"⚠️ {t['errores']} cohortes con error: {t['ultimo_error']}")
+            if t["estado"] == reportes_jobs.TERMINADO and t["archivo"]:
+                # El ZIP se lee solo al pedirlo, y se guarda uno por sesión
+                if st.button("📦 Preparar ZIP", key=f"preparar_zip_{t['id']}", use_container_width=True):
+                    with open(t["archivo"], "rb") as f:
+                        st.session_state["zip_reportes"] = (t["id"], f.read())
+                preparado = st.session_state.get("zip_reportes")
+                if preparado and preparado[0] == t["id"]:
+                    st.download_button("📥 Descargar ZIP", data=preparado[1], file_name=os.path.basename(t["archivo"]),
+                                       mime="application/zip", key=f"zip_{t['id']}", use_container_width=True)
+        if st.button("🔄 Actualizar estado", use_container_width=True):
+            st.rerun()
 
 if __name__ == "__main__":
     render_modulo_usabilidad()
\ No newline at end of file
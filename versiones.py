@@ -0,0 +1,82 @@
+import streamlit as st
+import hashlib
+import json
+import logging
+import time
+from postgrest.exceptions import APIError
+from supabase_client import get_supabase, ejecutar
+
+# =================================================================
+# SONDAS DE VERSIÓN DE DATOS
+# Una consulta mínima por tabla (conteo exacto + máximo de la marca) da un
+# token que cambia solo cuando cambian los datos. Las cachés derivadas se
+# indexan por ese token en lugar de vencer por tiempo.
+# =================================================================
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SONDA_SEG = 15
+
+# Tabla -> (clave, marca de modificación). Con marca se detectan ediciones;
+# sin ella (tablas append-only) basta con conteo + id máximo.
+SONDAS = {
+    "consolidado": ("EmployeeNumber", "updated_at"),
+    "encuestas": ("id", None),
+    "encuestas_usabilidad": ("id", None),
+}
+
+_sin_marca = set()  # Tablas donde la columna de marca aún no existe
+
+def _maximo(tabla: str, columna: str):
+    """(filas, máximo de `columna`) con una sola petición de una fila."""
+    consulta = (
+        get_supabase().table(tabla).select(columna, count="exact")
+        .order(columna, desc=True, nullsfirst=False).limit(1)
+    )
+    res = ejecutar(consulta)
+    return res.count, (res.data[0][columna] if res.data else None)
+
+@st.cache_data(ttl=INTERVALO_SONDA_SEG, show_spinner=False)
+def sondear(tabla: str):
+    """{filas, maximo, columna, token} de la tabla, o None si la sonda falla."""
+    clave, marca = SONDAS[tabla]
+    columna = marca if marca and tabla not in _sin_marca else clave
+    try:
+        try:
+            filas, maximo = _maximo(tabla, columna)
+        except APIError:
+            if columna == clave:
+                raise
+            # Sin columna updated_at (ver sql/versiones_datos.sql): se sondea por la clave
+            logger.warning("La tabla %s no tiene %s; la sonda usa %s", tabla, marca, clave)
+            _sin_marca.add(tabla)
+            columna = clave
+            filas, maximo = _maximo(tabla, columna)
+    except Exception as e:
+        logger.warning("Sonda de versión de %s falló: %s", tabla, e)
+        return None
+    token = hashlib.sha1(json.dumps([tabla, filas, columna, maximo], default=str).encode()).hexdigest()[:16]
+    return {"filas": filas, "maximo": maximo, "columna": columna, "token": token}
+
+def conteo_hasta(tabla: str, maximo):
+    """Filas remotas con clave <= `maximo`, sin caché; None si la consulta falla.
+
+    Las insertadas después de la marca de agua no cuentan, así que comparar con las
+    filas locales detecta borrados sin confundirlos con altas recientes.
+    """
+    clave, _ = SONDAS[tabla]
+    try:
+        res = ejecutar(get_supabase().table(tabla).select(clave, count="exact").lte(clave, maximo).limit(1))
+    except Exception as e:
+        logger.warning("Conteo de %s hasta %s falló: %s", tabla, maximo, e)
+        return None
+    return res.count
+
+def version_tabla(tabla: str):
+    """Token de versión de la tabla (None si no se pudo sondear)."""
+    sonda = sondear(tabla)
+    return sonda["token"] if sonda else None
+
+def version_o_ventana(tabla: str, ventana_seg: float) -> str:
+    """Token de versión; si la sonda falla, una ventana de tiempo para que la caché igual venza."""
+    return version_tabla(tabla) or f"t{int(time.time() // ventana_seg)}"